@@ -5,6 +5,9 @@ cases used by the project assistant are not public.
 
 import unittest
 import importlib
+import importlib.util
+import pickle
+import random
 import isolation
 import game_agent
 
@@ -36,5 +39,758 @@ class IsolationTest(unittest.TestCase):
         assert(terminal_test(game,game.active_player))
 """
 
+def random_games(width, height, seed):
+    """Yield a Board and a BitBoard after every move of a seeded random game
+    played on both, until the player to move is stuck.
+    """
+    rng = random.Random(seed)
+    board = isolation.Board("Player1", "Player2", width, height)
+    bitboard = isolation.BitBoard("Player1", "Player2", width, height)
+    yield board, bitboard
+    moves = sorted(board.get_legal_moves())
+    while moves:
+        move = rng.choice(moves)
+        board.apply_move(move)
+        bitboard.apply_move(move)
+        yield board, bitboard
+        moves = sorted(board.get_legal_moves())
+
+
+BOARD_SIZES = [(7, 7), (5, 5), (5, 6), (6, 4)]
+
+
+class BitBoardTest(unittest.TestCase):
+    """Unit tests for the BitBoard backend"""
+
+    def assertSameState(self, board, bitboard):
+        players = (board.active_player, board.inactive_player)
+        self.assertEqual(bitboard.to_string(), board.to_string())
+        self.assertEqual(bitboard.move_count, board.move_count)
+        self.assertEqual(bitboard.active_player, board.active_player)
+        self.assertEqual(sorted(bitboard.get_blank_spaces()),
+                         sorted(board.get_blank_spaces()))
+        for player in players:
+            self.assertEqual(sorted(bitboard.get_legal_moves(player)),
+                             sorted(board.get_legal_moves(player)))
+            self.assertEqual(bitboard.get_player_location(player),
+                             board.get_player_location(player))
+            self.assertEqual(bitboard.utility(player), board.utility(player))
+            self.assertEqual(bitboard.is_winner(player),
+                             board.is_winner(player))
+            self.assertEqual(bitboard.is_loser(player), board.is_loser(player))
+
+    def test_matches_board(self):
+        for width, height in BOARD_SIZES:
+            for seed in range(5):
+                for board, bitboard in random_games(width, height, seed):
+                    self.assertSameState(board, bitboard)
+                # The games end when the player to move is stuck
+                self.assertTrue(board.is_loser(board.active_player))
+
+    def test_forecast_and_copy(self):
+        for board, bitboard in random_games(7, 7, 0):
+            moves = sorted(board.get_legal_moves())
+            if moves:
+                self.assertSameState(board.forecast_move(moves[-1]),
+                                     bitboard.forecast_move(moves[-1]))
+            copy = bitboard.copy()
+            self.assertSameState(board, copy)
+        # Copies do not share state with the original
+        copy.apply_move(sorted(board.get_blank_spaces())[0])
+        self.assertSameState(board, bitboard)
+
+    def test_pickle(self):
+        for width, height in BOARD_SIZES:
+            for board, bitboard in random_games(width, height, 1):
+                restored = pickle.loads(pickle.dumps(bitboard))
+                self.assertSameState(board, restored)
+                self.assertEqual(restored.hash(), bitboard.hash())
+            # The restored board can keep playing
+            restored = pickle.loads(pickle.dumps(bitboard))
+            for move in sorted(board.get_blank_spaces())[:1]:
+                board.apply_move(move)
+                restored.apply_move(move)
+                self.assertSameState(board, restored)
+
+
+def snapshot(game):
+    """Return everything observable about the state of a board. """
+    players = (game.active_player, game.inactive_player)
+    return (game.to_string(), game.zobrist_key, game.move_count, players,
+            sorted(game.get_blank_spaces()),
+            [game.get_player_location(player) for player in players],
+            [sorted(game.get_legal_moves(player)) for player in players])
+
+
+class PushPopTest(unittest.TestCase):
+    """Unit tests for push_move and pop_move"""
+
+    def test_round_trip(self):
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            for width, height in BOARD_SIZES:
+                rng = random.Random("{}x{}".format(width, height))
+                game = board_cls("Player1", "Player2", width, height)
+                history = []
+                # Random walks of pushes and pops, so that moves are undone
+                # from every depth, including the placement moves
+                for _ in range(200):
+                    moves = sorted(game.get_legal_moves())
+                    if moves and (not history or rng.random() < 0.6):
+                        history.append(snapshot(game))
+                        game.push_move(rng.choice(moves))
+                    else:
+                        game.pop_move()
+                        self.assertEqual(snapshot(game), history.pop())
+                while history:
+                    game.pop_move()
+                    self.assertEqual(snapshot(game), history.pop())
+                self.assertEqual(
+                    snapshot(game),
+                    snapshot(board_cls("Player1", "Player2", width, height)))
+
+    def test_pop_without_push(self):
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            game = board_cls("Player1", "Player2")
+            game.push_move((3, 3))
+            game.pop_move()
+            with self.assertRaises(RuntimeError):
+                game.pop_move()
+
+
+def zobrist_from_scratch(game):
+    """Return the Zobrist key of a position computed from its cells and
+    player locations rather than incrementally.
+    """
+    height = game.height
+    cell_keys, (p1_keys, p2_keys), side_key = isolation.isolation.zobrist_keys(
+        game.width, height)
+    blank = set(game.get_blank_spaces())
+    key = side_key if game.move_count % 2 else 0
+    for col in range(game.width):
+        for row in range(height):
+            if (row, col) not in blank:
+                key ^= cell_keys[row + col * height]
+    # Player 1 holds the initiative after an even number of moves
+    if game.move_count % 2 == 0:
+        p1, p2 = game.active_player, game.inactive_player
+    else:
+        p1, p2 = game.inactive_player, game.active_player
+    for keys, player in ((p1_keys, p1), (p2_keys, p2)):
+        loc = game.get_player_location(player)
+        if loc is not None:
+            key ^= keys[loc[0] + loc[1] * height]
+    return key
+
+
+class ZobristTest(unittest.TestCase):
+    """Unit tests for the incremental Zobrist keys"""
+
+    def test_matches_key_from_scratch(self):
+        for width, height in BOARD_SIZES:
+            for seed in range(5):
+                for board, bitboard in random_games(width, height, seed):
+                    key = zobrist_from_scratch(board)
+                    self.assertEqual(board.zobrist_key, key)
+                    self.assertEqual(bitboard.zobrist_key, key)
+                    self.assertEqual(board.hash(), key)
+                    for game in (board, bitboard):
+                        self.assertEqual(game.copy().zobrist_key, key)
+                        self.assertEqual(
+                            pickle.loads(pickle.dumps(game)).zobrist_key, key)
+                        for move in game.get_legal_moves():
+                            child = game.forecast_move(move)
+                            self.assertEqual(child.zobrist_key,
+                                             zobrist_from_scratch(child))
+
+    def test_push_pop_keys(self):
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            rng = random.Random(0)
+            game = board_cls("Player1", "Player2")
+            for _ in range(300):
+                moves = game.get_legal_moves()
+                if moves and (not game.move_count or rng.random() < 0.6):
+                    game.push_move(rng.choice(moves))
+                else:
+                    game.pop_move()
+                self.assertEqual(game.zobrist_key, zobrist_from_scratch(game))
+
+    def test_transpositions_share_keys(self):
+        # Player 1 goes around the knight-move cycle (0, 0), (1, 2), (3, 3),
+        # (2, 1) in two different orders and ends on the same cell with the
+        # same cells blocked, while player 2 plays the same moves
+        first_path = [(0, 0), (1, 2), (3, 3), (2, 1)]
+        second_path = [(3, 3), (1, 2), (0, 0), (2, 1)]
+        opponent_path = [(6, 6), (4, 5), (6, 4), (4, 3)]
+        for board_cls in (isolation.Board, isolation.BitBoard):
+            games = []
+            for path in (first_path, second_path):
+                game = board_cls("Player1", "Player2")
+                for move, reply in zip(path, opponent_path):
+                    game.apply_move(move)
+                    game.apply_move(reply)
+                games.append(game)
+            self.assertEqual(games[0].to_string(), games[1].to_string())
+            self.assertEqual(games[0].zobrist_key, games[1].zobrist_key)
+
+
+def seated(game, player):
+    """Return a copy of the position with player to move. """
+    return game.with_players(player, "opponent")
+
+
+class TranspositionTableTest(unittest.TestCase):
+    """Unit tests for the transposition table and its use in alpha-beta"""
+
+    def test_replacement_policy(self):
+        from transposition import TranspositionTable, EXACT, LOWER
+
+        table = TranspositionTable(size_mb=0.01)
+        n = table.num_buckets
+        k1, k2, k3, k4, k5 = [3 + i * n for i in range(5)]
+        table.store(k1, 5, 1., EXACT, (0, 0))
+        # A shallower entry of the same bucket goes to the always-replace
+        # slot, and the next one replaces it there
+        table.store(k2, 3, 2., LOWER)
+        self.assertEqual(table.probe(k1)[1:3], (5, 1.))
+        self.assertEqual(table.probe(k2)[1:3], (3, 2.))
+        table.store(k3, 2, 3., EXACT)
+        self.assertIsNone(table.probe(k2))
+        self.assertEqual(table.probe(k1)[4], (0, 0))
+        self.assertEqual(table.probe(k3)[1], 2)
+        # A deeper entry takes the depth-preferred slot and demotes the
+        # entry it displaces
+        table.store(k4, 6, 4., EXACT)
+        self.assertIsNone(table.probe(k3))
+        self.assertEqual(table.probe(k4)[1], 6)
+        self.assertEqual(table.probe(k1)[1], 5)
+        self.assertEqual(len(table), 2)
+        # Entries of an earlier search no longer protect their slot
+        table.new_search()
+        table.store(k5, 1, 5., EXACT)
+        self.assertEqual(table.probe(k5)[5], 1)
+        self.assertEqual(table.probe(k4)[1], 6)
+        self.assertIsNone(table.probe(k1))
+        # A position searched again replaces its own entry, even shallower
+        table.store(k5, 0, 6., LOWER)
+        self.assertEqual(table.probe(k5)[1:4], (0, 6., LOWER))
+        self.assertEqual(len(table), 2)
+        table.clear()
+        self.assertEqual(len(table), 0)
+        self.assertIsNone(table.probe(k4))
+
+    def test_same_value_as_plain_alphabeta(self):
+        from sample_players import improved_score
+
+        for seed in range(4):
+            for game, _ in random_games(7, 7, seed):
+                if game.move_count < 2 or not game.get_legal_moves():
+                    continue
+                values = []
+                for tt_size_mb in (0, 1):
+                    player = game_agent.AlphaBetaPlayer(
+                        score_fn=improved_score, tt_size_mb=tt_size_mb)
+                    player.time_left = lambda: float("inf")
+                    position = seated(game, player)
+                    player.prepare_tt(position)
+                    for depth in range(1, 6):
+                        if player.tt is not None:
+                            # Fill the table with bounds from narrow windows,
+                            # as failed aspiration windows do, before the
+                            # full window search that reuses them
+                            for alpha, beta in ((-1.5, -.5), (.5, 1.5)):
+                                player.alphabeta(position, depth, alpha, beta)
+                        player.alphabeta(position, depth)
+                        values.append(player.root_value)
+                self.assertEqual(values[:5], values[5:], game.to_string())
+
+    def test_persisted_table_keeps_values(self):
+        from sample_players import improved_score
+
+        for seed in range(4):
+            player = game_agent.AlphaBetaPlayer(
+                score_fn=improved_score, tt_size_mb=1, persist_tt=True,
+                use_clock=False, depth_limit=5)
+            searches = 0
+            for game, _ in random_games(7, 7, seed):
+                if (game.move_count < 2 or game.move_count % 2 or
+                        not game.get_legal_moves()):
+                    continue
+                plain = game_agent.AlphaBetaPlayer(
+                    score_fn=improved_score, use_clock=False, depth_limit=5)
+                plain.get_move(seated(game, plain), lambda: 1000.)
+                player.get_move(seated(game, player), lambda: 1000.)
+                self.assertEqual(player.root_value, plain.root_value,
+                                 game.to_string())
+                searches += 1
+                # The table is kept from one move of the game to the next
+                self.assertEqual(player.tt.age, searches - 1)
+            self.assertGreater(searches, 1)
+
+
+class PrincipalVariationSearchTest(unittest.TestCase):
+    """Unit tests for principal variation search and aspiration windows"""
+
+    def test_same_value_as_plain_alphabeta(self):
+        from sample_players import improved_score
+
+        variants = [dict(pvs=True), dict(aspiration_window=1.),
+                    dict(pvs=True, aspiration_window=.5),
+                    dict(pvs=True, aspiration_window=.5, tt_size_mb=1)]
+        for seed in range(3):
+            for game, _ in random_games(7, 7, seed):
+                if game.move_count < 2 or not game.get_legal_moves():
+                    continue
+                values = []
+                for options in [{}] + variants:
+                    player = game_agent.AlphaBetaPlayer(
+                        score_fn=improved_score, use_clock=False,
+                        depth_limit=5, **options)
+                    player.get_move(seated(game, player), lambda: 1000.)
+                    values.append(player.root_value)
+                self.assertEqual(values, values[:1] * len(values),
+                                 game.to_string())
+
+
+class TimeManagerTest(unittest.TestCase):
+    """Unit tests for the iterative deepening time manager"""
+
+    def test_stop_rule(self):
+        from time_manager import TimeManager
+
+        manager = TimeManager(extension=1., few_moves=2)
+        manager.start(100., 5, 40)
+        # Iterations of 10, 30 and 90 nodes taking 1, 3 and 9 ms
+        for depth, nodes, time_left in [(1, 10, 99.), (2, 40, 96.),
+                                        (3, 130, 87.)]:
+            manager.iteration_done(depth, nodes, time_left, (0, 0))
+            if depth == 1:
+                self.assertIsNone(manager.predicted_time())
+                self.assertFalse(manager.should_stop(time_left))
+        self.assertAlmostEqual(manager.branching_factor(), 3.)
+        self.assertAlmostEqual(manager.predicted_time(), 27.)
+        self.assertFalse(manager.should_stop(87.))
+        manager.iteration_done(4, 400, 60., (0, 0))
+        self.assertAlmostEqual(manager.predicted_time(), 81.)
+        self.assertTrue(manager.should_stop(60.))
+        self.assertEqual(manager.early_stops, 1)
+        # A changed best move makes the position critical and extends the
+        # budget to twice the time left
+        manager.iteration_done(5, 1210, 33., (1, 2))
+        self.assertTrue(manager.is_critical())
+        self.assertFalse(manager.should_stop(60.))
+        self.assertTrue(manager.should_stop(40.))
+        self.assertEqual(manager.early_stops, 2)
+
+    def test_few_moves_min_branching_and_horizon(self):
+        from time_manager import TimeManager
+
+        manager = TimeManager(few_moves=2, min_branching=1.5)
+        manager.start(100., 2, 3)
+        self.assertTrue(manager.is_critical())
+        for depth, nodes, time_left in [(1, 10, 90.), (2, 20, 80.)]:
+            manager.iteration_done(depth, nodes, time_left, (0, 0))
+        self.assertAlmostEqual(manager.branching_factor(), 1.5)
+        self.assertFalse(manager.should_stop(80.))
+        manager.iteration_done(3, 30, 70., (0, 0))
+        self.assertTrue(manager.should_stop(70.))
+
+    def test_search_stops_before_the_timer(self):
+        from sample_players import improved_score
+        from time_manager import TimeManager
+
+        for game, _ in random_games(7, 7, 0):
+            if game.move_count == 4:
+                break
+        stopped = []
+        for manager in (None, TimeManager()):
+            player = game_agent.AlphaBetaPlayer(
+                score_fn=improved_score, time_manager=manager,
+                instrument=True)
+            # A fake clock on which every node takes 10 microseconds
+            clock = lambda: 300. - .01 * player.nodes
+            position = seated(game, player)
+            position.shuffle_moves = False
+            player.get_move(position, clock)
+            stopped.append((player.last_stats.max_depth,
+                            clock() - player.TIMER_THRESHOLD))
+        (depth, left), (managed_depth, managed_left) = stopped
+        # The managed search completes the same iterations without starting
+        # one that it has to abandon
+        self.assertEqual(managed_depth, depth)
+        self.assertLess(left, 0.)
+        self.assertGreater(managed_left, 0.)
+        self.assertEqual(manager.early_stops, 1)
+
+
+class SymmetryTest(unittest.TestCase):
+    """Unit tests for the board symmetries and canonical keys"""
+
+    def test_symmetries(self):
+        from isolation.symmetry import symmetries
+
+        for width, height in BOARD_SIZES:
+            perms = symmetries(width, height)
+            self.assertEqual(len(perms), 8 if width == height else 4)
+            self.assertEqual(perms[0][0], tuple(range(width * height)))
+            for perm, inverse in perms:
+                self.assertEqual(sorted(perm), list(range(width * height)))
+                self.assertEqual([inverse[idx] for idx in perm],
+                                 list(range(width * height)))
+
+    def test_canonical_key_is_shared_by_all_symmetries(self):
+        from isolation.symmetry import canonical_key, symmetries
+
+        for width, height in BOARD_SIZES:
+            perms = symmetries(width, height)
+            for board, bitboard in random_games(width, height, 2):
+                for game in (board, bitboard):
+                    key = canonical_key(game)[0]
+                    for perm, _ in perms:
+                        variant = game.transformed(perm)
+                        self.assertEqual(variant.zobrist_key,
+                                         zobrist_from_scratch(variant))
+                        self.assertEqual(canonical_key(variant)[0], key)
+
+    def test_canonical_board(self):
+        from isolation.symmetry import canonical_board, canonical_key
+
+        for board, bitboard in random_games(7, 7, 3):
+            for game in (board, bitboard):
+                key, sym = canonical_key(game)
+                canonical, canonical_sym = canonical_board(game)
+                self.assertEqual(canonical_sym, sym)
+                self.assertEqual(canonical.zobrist_key, key)
+
+    def test_move_round_trips(self):
+        from isolation.symmetry import (canonical_board, from_canonical,
+                                        symmetries, to_canonical)
+
+        for width, height in BOARD_SIZES:
+            for game, _ in random_games(width, height, 4):
+                canonical, sym = canonical_board(game)
+                moves = game.get_legal_moves()
+                self.assertEqual(
+                    sorted(to_canonical(game, move, sym) for move in moves),
+                    sorted(canonical.get_legal_moves()))
+                for sym in range(len(symmetries(width, height))):
+                    for move in moves:
+                        self.assertEqual(from_canonical(
+                            game, to_canonical(game, move, sym), sym), move)
+                    for move in (None, (-1, -1)):
+                        self.assertEqual(to_canonical(game, move, sym), move)
+                        self.assertEqual(from_canonical(game, move, sym),
+                                         move)
+
+
+def run_standalone(module, script):
+    """Run a script in a fresh interpreter that can only import the given
+    agent module and the isolation package, as when the agent is submitted
+    on its own, and return its output.
+    """
+    import os
+    import shutil
+    import subprocess
+    import sys
+    import tempfile
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as path:
+        shutil.copy(os.path.join(root, module + ".py"), path)
+        shutil.copytree(os.path.join(root, "isolation"),
+                        os.path.join(path, "isolation"),
+                        ignore=shutil.ignore_patterns("__pycache__"))
+        return subprocess.run([sys.executable, "-E", "-c", script], cwd=path,
+                              check=True, capture_output=True,
+                              text=True).stdout
+
+
+# Imports the agent before anything else and prints the modules outside the
+# ones allowed by the project assistant that it loaded, then plays a game
+# between two default agents
+STANDALONE_SCRIPT = """
+import sys
+loaded = set(sys.modules)
+import {module}
+print(sorted({{name.partition(".")[0] for name in sys.modules}} - loaded &
+             {{"concurrent", "isolation", "search_stats", "threading", "time",
+              "timeit", "transposition"}}))
+from isolation import Board
+players = [{module}.{player}(), {module}.{player}()]
+winner, history, outcome = Board(*players).play(time_limit=50)
+print(outcome)
+print({module}.{player}(instrument=True).total_stats)
+"""
+
+
+class StandaloneAgentTest(unittest.TestCase):
+    """Unit tests for the agents submitted as a single file"""
+
+    def test_game_agent(self):
+        output = run_standalone("game_agent", STANDALONE_SCRIPT.format(
+            module="game_agent", player="AlphaBetaPlayer"))
+        loaded, outcome, stats = output.split("\n")[:3]
+        self.assertEqual(loaded, "[]")
+        self.assertNotEqual(outcome, "timeout")
+        self.assertEqual(stats, "None")
+
+    def test_competition_agent(self):
+        output = run_standalone("competition_agent", STANDALONE_SCRIPT.format(
+            module="competition_agent", player="CustomPlayer"))
+        loaded, outcome, stats = output.split("\n")[:3]
+        self.assertEqual(loaded, "[]")
+        self.assertNotEqual(outcome, "timeout")
+        self.assertEqual(stats, "None")
+
+
+class TournamentTest(unittest.TestCase):
+    """Unit tests for the tournament script"""
+
+    def test_seeded_games_are_reproducible(self):
+        from sample_players import RandomPlayer, improved_score
+        from tournament import game_seed, new_game, random_opening
+
+        self.assertIsNone(game_seed(None, "Random", 0))
+        self.assertEqual(random_opening(game_seed(3, "Random", 0)),
+                         random_opening(game_seed(3, "Random", 0)))
+        for seed in range(2):
+            histories = []
+            for _ in range(3):
+                player = game_agent.AlphaBetaPlayer(
+                    score_fn=improved_score, node_limit=2000, use_clock=False)
+                opponents = [RandomPlayer(), game_agent.AlphaBetaPlayer(
+                    node_limit=2000, use_clock=False)]
+                history = []
+                for idx, opponent in enumerate(opponents):
+                    game = new_game(player, opponent,
+                                    random_opening(game_seed(seed, idx)),
+                                    game_seed(seed, idx, True))
+                    history.append(game.play(time_limit=float("inf"))[1])
+                histories.append(history)
+            self.assertEqual(histories[0], histories[1])
+            self.assertEqual(histories[0], histories[2])
+
+
+class SchedulerTest(unittest.TestCase):
+    """Unit tests for the resumable game scheduler"""
+
+    def test_wilson_interval(self):
+        from scheduler import wilson_interval
+
+        for wins, games, expected in [(5, 10, (.2366, .7634)),
+                                      (0, 10, (0., .2775)),
+                                      (10, 10, (.7225, 1.)),
+                                      (500, 1000, (.4691, .5309)),
+                                      (0, 0, (0., 1.))]:
+            low, high = wilson_interval(wins, games)
+            self.assertAlmostEqual(low, expected[0], places=4)
+            self.assertAlmostEqual(high, expected[1], places=4)
+
+    def run_games(self, path, fmt, num_games):
+        from sample_players import RandomPlayer
+        from scheduler import run
+        from tournament import Agent, AgentSpec
+
+        agents = [Agent(AgentSpec(RandomPlayer), "Random")]
+        return run(path, num_games, fmt=fmt, report_every=0,
+                   cpu_agents=agents, test_agents=agents)
+
+    def read_records(self, path, fmt):
+        import csv
+        import json
+
+        with open(path, newline="") as f:
+            if fmt == "csv":
+                return list(csv.DictReader(f))
+            return [json.loads(line) for line in f]
+
+    def test_resume_after_truncated_record(self):
+        import contextlib
+        import io
+        import os
+        import tempfile
+
+        from scheduler import trim_partial_record
+
+        for fmt in ("jsonl", "csv"):
+            with tempfile.TemporaryDirectory() as tmp, \
+                    contextlib.redirect_stdout(io.StringIO()):
+                path = os.path.join(tmp, "results." + fmt)
+                self.assertEqual(trim_partial_record(path), 0)
+                self.run_games(path, fmt, 4)
+                records = self.read_records(path, fmt)
+                self.assertEqual([int(r["game"]) for r in records],
+                                 [0, 1, 2, 3])
+                self.assertEqual(trim_partial_record(path), 0)
+                # Interrupt the run in the middle of the last record
+                with open(path, "r+b") as f:
+                    f.truncate(os.path.getsize(path) - 10)
+                self.assertGreater(trim_partial_record(path), 0)
+                self.assertEqual(len(self.read_records(path, fmt)), 3)
+                # Interrupt it again and let the resumed run drop the partial
+                # record: it replays that game and adds the new ones,
+                # recording every game once
+                with open(path, "r+b") as f:
+                    f.truncate(os.path.getsize(path) - 10)
+                scoreboard = self.run_games(path, fmt, 6)
+                records = self.read_records(path, fmt)
+                self.assertEqual([int(r["game"]) for r in records],
+                                 [0, 1, 2, 3, 4, 5])
+                self.assertEqual(scoreboard.completed(), 6)
+                self.assertEqual(scoreboard.wins[("Random", "Random")],
+                                 sum(r["winner"] == "test" for r in records))
+
+
+@unittest.skipIf(importlib.util.find_spec("numpy") is None,
+                 "batch_eval needs NumPy")
+class BatchEvalTest(unittest.TestCase):
+    """Unit tests for the vectorized heuristics"""
+
+    def assertSameScores(self, games, player, batch):
+        from batch_eval import center_scores, improved_scores, open_move_scores
+        from sample_players import center_score, improved_score, open_move_score
+
+        pairs = [(open_move_scores, open_move_score),
+                 (improved_scores, improved_score)]
+        if all(game.get_player_location(player) for game in games):
+            pairs.append((center_scores, center_score))
+        for batch_fn, score_fn in pairs:
+            self.assertEqual(list(batch_fn(batch)),
+                             [score_fn(game, player) for game in games])
+
+    def test_matches_scalar_heuristics(self):
+        from batch_eval import PositionBatch, evaluate_children
+        from sample_players import improved_score
+
+        for width, height in BOARD_SIZES:
+            for seed in range(3):
+                games = [board.copy() for board, _ in
+                         random_games(width, height, seed)]
+                for player in ("Player1", "Player2"):
+                    self.assertSameScores(
+                        games, player, PositionBatch.from_games(games, player))
+                    for game in games:
+                        moves, batch = PositionBatch.children(game, player)
+                        if not moves:
+                            continue
+                        children = [game.forecast_move(m) for m in moves]
+                        self.assertSameScores(children, player, batch)
+                        moves, scores = evaluate_children(game, player)
+                        self.assertEqual(list(scores), [
+                            improved_score(game.forecast_move(move), player)
+                            for move in moves])
+
+
+class CompetitionAgentTest(unittest.TestCase):
+    """Unit tests for the Monte Carlo tree search competition agent"""
+
+    def test_no_timeouts(self):
+        from competition_agent import CustomPlayer
+        from sample_players import RandomPlayer
+
+        margins = []
+
+        class TimedPlayer(CustomPlayer):
+            def get_move(self, game, time_left):
+                move = super().get_move(game, time_left)
+                margins.append(time_left())
+                return move
+
+        for i, opponent in enumerate([game_agent.AlphaBetaPlayer(),
+                                      RandomPlayer()] * 2):
+            player = TimedPlayer(seed=i)
+            players = (player, opponent) if i % 2 else (opponent, player)
+            game = isolation.Board(*players)
+            winner, history, outcome = game.play(time_limit=50)
+            self.assertFalse(outcome == "timeout" and winner is not player,
+                             "CustomPlayer forfeited game {} on time".format(i))
+        # Every move must leave a safety margin, not just a non-negative
+        # time left
+        self.assertGreater(min(margins), 1.)
+
+
+def exhaustive_win(game, memo):
+    """Return True if the player to move wins the game with perfect play,
+    by searching the complete game tree.
+    """
+    key = game.zobrist_key
+    if key not in memo:
+        memo[key] = any(not exhaustive_win(game.forecast_move(move), memo)
+                        for move in game.get_legal_moves())
+    return memo[key]
+
+
+def separated_positions(width, height, count, seed=0):
+    """Return positions from seeded random playouts in which the players
+    can no longer reach a common cell and the player to move can move.
+    """
+    from endgame import knight_masks, region
+
+    rng = random.Random(seed)
+    masks = knight_masks(width, height)
+    positions = []
+    while len(positions) < count:
+        game = isolation.Board("Player1", "Player2", width, height)
+        while game.get_legal_moves():
+            game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+            if game.move_count < 2 or not game.get_legal_moves():
+                continue
+            locs = [game.get_player_location(player) for player in
+                    (game.active_player, game.inactive_player)]
+            active, inactive = [r + c * height for r, c in locs]
+            free = game.blank_mask()
+            if not region(masks, active, free) & region(masks, inactive, free):
+                positions.append(game)
+                break
+    return positions
+
+
+class EndgameSolverTest(unittest.TestCase):
+    """Unit tests for the endgame solver"""
+
+    def test_matches_exhaustive_search(self):
+        from endgame import EndgameSolver
+
+        for width, height in [(5, 5), (4, 5), (6, 4)]:
+            solver = EndgameSolver()
+            memo = {}
+            for game in separated_positions(width, height, 60):
+                wins = exhaustive_win(game, memo)
+                value = solver.value(game)
+                self.assertEqual(value == float("inf"), wins,
+                                 game.to_string())
+                # The move of a won position must keep the win
+                if wins:
+                    move = solver.solve(game)[2]
+                    self.assertIn(move, game.get_legal_moves())
+                    self.assertFalse(
+                        exhaustive_win(game.forecast_move(move), memo))
+
+    def test_connected_positions_are_not_solved(self):
+        from endgame import EndgameSolver
+
+        game = isolation.Board("Player1", "Player2")
+        game.apply_move((3, 3))
+        game.apply_move((2, 2))
+        self.assertIsNone(EndgameSolver().solve(game))
+
+    def test_unfinished_root_solve_falls_back_to_search(self):
+        from endgame import EndgameSolver
+
+        class UnfinishedSolver(EndgameSolver):
+            def solve(self, game, check=None):
+                raise game_agent.SearchTimeout()
+
+        for game in separated_positions(7, 7, 10):
+            game.shuffle_moves = False
+            moves = []
+            for solver in (None, UnfinishedSolver(min_depth=99)):
+                player = game_agent.AlphaBetaPlayer(
+                    endgame_solver=solver, use_clock=False, depth_limit=3)
+                position = game.with_players(player, "opponent")
+                moves.append(player.get_move(position, lambda: 1000.))
+                self.assertGreater(player.nodes, 0)
+            self.assertEqual(moves[0], moves[1])
+
+
 if __name__ == '__main__':
     unittest.main()
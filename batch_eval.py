@@ -0,0 +1,235 @@
+"""This file contains vectorized versions of the heuristics in
+`sample_players` that score many positions in one call with NumPy, for
+searches that evaluate all the children of a node near the search horizon
+at once.
+
+Positions are encoded in a `PositionBatch` of arrays: the blocked cells of
+each position (indexed like `isolation.Board`, index = row + col * height),
+the cell index of each player and whether the scored player is to move.
+`PositionBatch.from_games` encodes existing boards, and
+`PositionBatch.children` encodes every child of a position without creating
+the child boards:
+
+    moves, batch = PositionBatch.children(game, player)
+    scores = improved_scores(batch)
+
+NumPy is only needed by this module; the rest of the project does not
+depend on it.
+"""
+import numpy as np
+
+from isolation.isolation import knight_neighbors
+
+# Knight-move target tables shared by every batch with the same geometry
+_MOVE_TABLES = {}
+
+
+def move_table(width, height):
+    """Return the knight-move table of a board of the given dimensions: an
+    integer array of shape (width * height + 1, 8) whose row i holds the
+    cell indices reachable from cell i, padded with the index width * height
+    of a sentinel cell that is always blocked. The last row is all sentinel,
+    for players that are not on the board.
+    """
+    key = (width, height)
+    table = _MOVE_TABLES.get(key)
+    if table is None:
+        cells = width * height
+        table = np.full((cells + 1, 8), cells, dtype=np.intp)
+        for idx, neighbors in enumerate(knight_neighbors(width, height)):
+            for k, (target, _) in enumerate(neighbors):
+                table[idx, k] = target
+        _MOVE_TABLES[key] = table
+    return table
+
+
+def _cell_index(game, location):
+    # Returns the cell index of a (row, col) location, or -1 for None
+    if location is None:
+        return -1
+    return location[0] + location[1] * game.height
+
+
+class PositionBatch:
+    """Positions of boards of the same dimensions encoded as arrays, scored
+    from the point of view of one player.
+
+    Parameters
+    ----------
+    width, height : int
+        The dimensions of the boards.
+
+    blocked : numpy.ndarray
+        Boolean array of shape (n, width * height + 1): True for the blocked
+        (visited or occupied) cells of each position. The last column is the
+        sentinel cell of `move_table` and must be True.
+
+    own_loc, opp_loc : numpy.ndarray
+        Integer arrays of shape (n,): the cell index of the scored player
+        and of its opponent in each position, or -1 if not on the board yet.
+
+    own_to_move : numpy.ndarray
+        Boolean array of shape (n,): True where the scored player is the
+        active player.
+    """
+
+    def __init__(self, width, height, blocked, own_loc, opp_loc, own_to_move):
+        self.width = width
+        self.height = height
+        self.blocked = blocked
+        self.own_loc = own_loc
+        self.opp_loc = opp_loc
+        self.own_to_move = own_to_move
+
+    def __len__(self):
+        return len(self.own_loc)
+
+    @classmethod
+    def from_games(cls, games, player):
+        """Encode a sequence of boards of the same dimensions, scored from the
+        point of view of player.
+        """
+        games = list(games)
+        width, height = games[0].width, games[0].height
+        cells = width * height
+        blocked = np.ones((len(games), cells + 1), dtype=bool)
+        own_loc = np.empty(len(games), dtype=np.intp)
+        opp_loc = np.empty(len(games), dtype=np.intp)
+        own_to_move = np.empty(len(games), dtype=bool)
+        for i, game in enumerate(games):
+            if (game.width, game.height) != (width, height):
+                raise ValueError("All boards of a batch must have the same "
+                                 "dimensions.")
+            blanks = [r + c * height for r, c in game.get_blank_spaces()]
+            blocked[i, blanks] = False
+            own_loc[i] = _cell_index(game, game.get_player_location(player))
+            opp_loc[i] = _cell_index(game, game.get_player_location(
+                game.get_opponent(player)))
+            own_to_move[i] = game.active_player == player
+        return cls(width, height, blocked, own_loc, opp_loc, own_to_move)
+
+    @classmethod
+    def children(cls, game, player):
+        """Encode every child of a position (the position after each legal
+        move of the active player), scored from the point of view of player.
+
+        Returns
+        -------
+        (list<(int, int)>, PositionBatch)
+            The legal moves of the active player and the batch of the
+            positions they lead to, in the same order.
+        """
+        moves = game.get_legal_moves()
+        parent = cls.from_games([game], player)
+        n = len(moves)
+        targets = np.array([_cell_index(game, move) for move in moves],
+                           dtype=np.intp)
+        blocked = np.repeat(parent.blocked, n, axis=0)
+        blocked[np.arange(n), targets] = True
+        if parent.own_to_move[0]:
+            own_loc = targets
+            opp_loc = np.repeat(parent.opp_loc, n)
+        else:
+            own_loc = np.repeat(parent.own_loc, n)
+            opp_loc = targets
+        own_to_move = np.repeat(~parent.own_to_move, n)
+        return moves, cls(game.width, game.height, blocked, own_loc, opp_loc,
+                          own_to_move)
+
+
+def mobility(batch, locations):
+    """Return the number of legal moves of a player at the given cell
+    indices (-1 if not on the board yet, in which case every blank cell is
+    a legal move) in each position of the batch.
+    """
+    return _mobility(batch, locations, np.arange(len(locations)))
+
+
+def _mobility(batch, locations, rows):
+    # Counts the legal moves from locations[i] in the position rows[i]
+    cells = batch.width * batch.height
+    table = move_table(batch.width, batch.height)
+    placed = locations >= 0
+    targets = table[np.where(placed, locations, cells)]
+    counts = (~batch.blocked[rows[:, None], targets]).sum(axis=1)
+    if placed.all():
+        return counts
+    blanks = cells - batch.blocked[rows, :cells].sum(axis=1)
+    return np.where(placed, counts, blanks)
+
+
+def _both_mobilities(batch):
+    # Returns the mobility of the scored player and of its opponent, counted
+    # in a single pass over the batch
+    n = len(batch)
+    rows = np.arange(n)
+    counts = _mobility(batch, np.concatenate((batch.own_loc, batch.opp_loc)),
+                       np.concatenate((rows, rows)))
+    return counts[:n], counts[n:]
+
+
+def _with_outcomes(batch, scores, own_moves, opp_moves):
+    # Replaces the scores of finished games by -inf (the scored player is to
+    # move and stuck) or +inf (its opponent is to move and stuck)
+    scores = scores.astype(float)
+    scores[batch.own_to_move & (own_moves == 0)] = float("-inf")
+    scores[~batch.own_to_move & (opp_moves == 0)] = float("inf")
+    return scores
+
+
+def open_move_scores(batch):
+    """Vectorized `sample_players.open_move_score`: the number of legal moves
+    of the scored player in each position of the batch.
+    """
+    own_moves, opp_moves = _both_mobilities(batch)
+    return _with_outcomes(batch, own_moves, own_moves, opp_moves)
+
+
+def improved_scores(batch):
+    """Vectorized `sample_players.improved_score`: the difference between
+    the number of legal moves of the scored player and of its opponent in
+    each position of the batch.
+    """
+    own_moves, opp_moves = _both_mobilities(batch)
+    return _with_outcomes(batch, own_moves - opp_moves, own_moves, opp_moves)
+
+
+def center_scores(batch):
+    """Vectorized `sample_players.center_score`: the squared distance from
+    the center of the board to the scored player in each position of the
+    batch (NaN where the player is not on the board yet).
+    """
+    own_moves, opp_moves = _both_mobilities(batch)
+    rows = batch.own_loc % batch.height
+    cols = batch.own_loc // batch.height
+    scores = ((batch.height / 2. - rows) ** 2 +
+              (batch.width / 2. - cols) ** 2)
+    scores = np.where(batch.own_loc >= 0, scores, np.nan)
+    return _with_outcomes(batch, scores, own_moves, opp_moves)
+
+
+def evaluate_children(game, player, score_fn=improved_scores):
+    """Score every child of a position from the point of view of player in
+    one vectorized call.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The parent position.
+
+    player : object
+        The player from whose point of view the children are scored.
+
+    score_fn : callable (optional)
+        A batch score function such as `improved_scores`.
+
+    Returns
+    -------
+    (list<(int, int)>, numpy.ndarray)
+        The legal moves of the active player and the score of the position
+        each one leads to.
+    """
+    moves, batch = PositionBatch.children(game, player)
+    if not moves:
+        return moves, np.empty(0)
+    return moves, score_fn(batch)
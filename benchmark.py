@@ -0,0 +1,412 @@
+"""Microbenchmarks for the `isolation.Board` primitives and the heuristic
+score functions, used to catch performance regressions before changes to
+`isolation/isolation.py` (or the heuristics) reach a tournament.
+
+Every benchmark replays a fixed corpus of mid-game positions for several
+board sizes. The corpus is generated from seeded random playouts, so it is
+identical on every run. For each (board class, board size, operation) the
+script reports calls per second, median and tail latencies, and the bytes
+allocated by one call (the tracemalloc peak).
+
+Machines (especially shared ones) run faster or slower from one moment to
+the next. To keep the regression gate stable:
+
+- every timing sample makes enough calls to last at least
+  MIN_SAMPLE_SECONDS, so that sub-microsecond operations are not dominated
+  by timer resolution and interruptions;
+- calls per second come from the fastest of several rounds for each
+  position, since noise only ever makes a round slower;
+- every sample is preceded by a sample of a fixed pure-Python calibration
+  workload, and comparisons against the baseline use the median cost of
+  the operation relative to that workload, which cancels out changes of
+  the machine speed that last longer than a sample;
+- slowdowns smaller than NOISE_FLOOR_US per call are not reported as
+  regressions, however large they are relative to a very fast operation;
+- benchmarks that fail --check are timed again, and only reported if they
+  are still too slow.
+
+Example:
+
+    python benchmark.py                    # print results
+    python benchmark.py --save-baseline    # record benchmark_baseline.json
+    python benchmark.py --check            # fail if >20% slower than baseline
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+
+from statistics import median
+
+from isolation import Board, BitBoard
+import game_agent
+import sample_players
+
+BOARD_CLASSES = {"Board": Board, "BitBoard": BitBoard}
+BOARD_SIZES = [(5, 5), (7, 7), (9, 9)]
+POSITIONS_PER_SIZE = 20
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "benchmark_baseline.json")
+
+# Key of the calibration workload in the results and baseline file
+CALIBRATION = "calibration"
+
+# Maximum allowed slowdown (as a fraction of the baseline calls per second)
+# before --check fails
+DEFAULT_THRESHOLD = 0.2
+
+# Minimum duration of a timing sample, in seconds
+MIN_SAMPLE_SECONDS = 0.001
+
+# Slowdowns of less than this many microseconds per call are within the noise
+# of the machine, whatever the threshold
+NOISE_FLOOR_US = 0.02
+
+
+def make_corpus(board_cls, width, height, count=POSITIONS_PER_SIZE, seed=0):
+    """Return a list of (board, move) pairs of mid-game positions where the
+    active player has at least one legal move, and move is one of them.
+    """
+    rng = random.Random("{}-{}x{}".format(seed, width, height))
+    corpus = []
+    while len(corpus) < count:
+        game = board_cls("Player1", "Player2", width, height,
+                         seed=rng.random())
+        plies = rng.randint(4, max(4, width * height // 3))
+        for _ in range(plies):
+            moves = sorted(game.get_legal_moves())
+            if not moves:
+                break
+            game.apply_move(rng.choice(moves))
+        moves = sorted(game.get_legal_moves())
+        if moves:
+            corpus.append((game, rng.choice(moves)))
+    return corpus
+
+
+def _apply_move(game, move):
+    # apply_move() modifies the board, so it is timed together with the
+    # pop_move() that restores it (see push_move/pop_move)
+    game.push_move(move)
+    game.pop_move()
+
+
+def _score(fn):
+    return lambda game, move: fn(game, game.active_player)
+
+
+def _search(depth):
+    # A fixed-depth alpha-beta search of the position by an AlphaBetaPlayer
+    # seated in place of the active player. Moves are not shuffled, so that
+    # every call searches the same tree.
+    player = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score)
+    player.time_left = lambda: float("inf")
+
+    def search(game, move):
+        position = game.with_players(player, game.inactive_player)
+        position.shuffle_moves = False
+        return player.alphabeta(position, depth)
+    return search
+
+
+OPERATIONS = {
+    "get_legal_moves": lambda game, move: game.get_legal_moves(),
+    "push_pop_move": _apply_move,
+    "forecast_move": lambda game, move: game.forecast_move(move),
+    "copy": lambda game, move: game.copy(),
+    "hash": lambda game, move: game.hash(),
+    "utility": lambda game, move: game.utility(game.active_player),
+    "is_loser": lambda game, move: game.is_loser(game.active_player),
+    "has_legal_move": lambda game, move: game.has_legal_move(),
+    "count_legal_moves": lambda game, move: game.count_legal_moves(),
+    "open_move_score": _score(sample_players.open_move_score),
+    "improved_score": _score(sample_players.improved_score),
+    "center_score": _score(sample_players.center_score),
+    "custom_score": _score(game_agent.custom_score),
+    "custom_score_2": _score(game_agent.custom_score_2),
+    "custom_score_3": _score(game_agent.custom_score_3),
+    "alphabeta_depth3": _search(3),
+}
+
+# Minimum calls per timing sample of operations that run a whole search,
+# instead of the --inner minimum meant for the primitives
+SEARCH_INNER = {"alphabeta_depth3": 1}
+
+
+def percentile(sorted_values, fraction):
+    """Return the value at the given fraction of a sorted list. """
+    idx = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[idx]
+
+
+def inner_calls(op, corpus, inner=200):
+    """Return the number of calls per timing sample of op: at least `inner`,
+    and enough for a sample of the fastest position of the corpus to last
+    MIN_SAMPLE_SECONDS.
+    """
+    fastest = min(time_operation(op, corpus, inner))
+    if fastest <= 0:
+        return inner
+    return max(inner, int(MIN_SAMPLE_SECONDS / fastest) + 1)
+
+
+def time_operation(op, corpus, inner=200):
+    """Return one timing sample per position of the corpus: the mean time in
+    seconds of `inner` back-to-back calls of op on that position.
+    """
+    timer = timeit.default_timer
+    samples = []
+    for game, move in corpus:
+        start = timer()
+        for _ in range(inner):
+            op(game, move)
+        samples.append((timer() - start) / inner)
+    return samples
+
+
+def time_calibrated(op, corpus, inner, calibration_inner):
+    """Return (samples, calibration samples) for every position of the
+    corpus, where each sample of op (see `time_operation`) is preceded by a
+    sample of the calibration workload. Changes of the machine speed that
+    last longer than a sample affect both, so their ratio cancels them out.
+    """
+    samples = []
+    calibration = []
+    for position in corpus:
+        calibration.extend(time_operation(_calibration_workload,
+                                          [(None, None)], calibration_inner))
+        samples.extend(time_operation(op, [position], inner))
+    return samples, calibration
+
+
+def allocations(op, corpus):
+    """Return the mean number of bytes allocated by one call of op (the
+    tracemalloc peak above the memory in use before the call).
+    """
+    allocs = []
+    tracemalloc.start()
+    for game, move in corpus:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        op(game, move)
+        allocs.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return sum(allocs) / len(allocs)
+
+
+def _calibration_workload(game, move):
+    # Fixed pure-Python work (no Board code) whose speed tracks the speed of
+    # the interpreter and machine at the time of the run
+    total = 0
+    for i in range(50):
+        total += i * i
+    return total
+
+
+def summarize(rounds, alloc_bytes, calibration=None):
+    """Return the result dict of a benchmark: calls per second, p50/p90/p99
+    latency in microseconds, bytes allocated per call, and the cost of a
+    call relative to the calibration workload.
+
+    Parameters
+    ----------
+    rounds : list<list<float>>
+        The samples of every round, one per position of the corpus in the
+        same order.
+
+    alloc_bytes : float
+        Bytes allocated per call.
+
+    calibration : list<list<float>> (optional)
+        The calibration samples taken right before the samples in rounds.
+    """
+    # Calls per second are derived from the fastest round of each position,
+    # since noise only ever makes a round slower
+    best = [min(times) for times in zip(*rounds)]
+    per_call = sum(best) / len(best)
+    result = {
+        "ops_per_sec": 1. / per_call if per_call else float("inf"),
+    }
+    if calibration is not None:
+        # Noise can make either side of the ratio slower, so the relative
+        # cost is the median over the rounds
+        costs = [median([t / c for t, c in zip(times, calibrations)])
+                 for times, calibrations in zip(zip(*rounds),
+                                                zip(*calibration))]
+        result["cost"] = sum(costs) / len(costs)
+    samples = sorted(t for times in rounds for t in times)
+    result.update({
+        "p50_us": 1e6 * percentile(samples, 0.5),
+        "p90_us": 1e6 * percentile(samples, 0.9),
+        "p99_us": 1e6 * percentile(samples, 0.99),
+        "alloc_bytes": alloc_bytes,
+    })
+    return result
+
+
+def run(board_names, operations, inner=200, rounds=10, only=None):
+    """Run the selected benchmarks and return {key: result}, where key is
+    "<board class>/<width>x<height>/<operation>". If `only` is given, run
+    just the benchmarks with those keys.
+
+    Rounds are interleaved across all benchmarks, so that a slow period of
+    the machine affects every benchmark a little instead of a few a lot.
+    Each sample makes at least `inner` calls (more for fast operations; see
+    `inner_calls`) and is preceded by a sample of a fixed pure-Python
+    workload, the speed of which is reported in the CALIBRATION entry.
+    """
+    calibration_inner = inner_calls(_calibration_workload, [(None, None)],
+                                    inner)
+    benchmarks = {}
+    for board_name in board_names:
+        for width, height in BOARD_SIZES:
+            corpus = make_corpus(BOARD_CLASSES[board_name], width, height)
+            for op_name in operations:
+                key = "{}/{}x{}/{}".format(board_name, width, height, op_name)
+                if only is None or key in only:
+                    benchmarks[key] = (OPERATIONS[op_name], corpus)
+    calls = {key: inner_calls(op, corpus,
+                              min(inner, SEARCH_INNER.get(key.split("/")[-1],
+                                                          inner)))
+             for key, (op, corpus) in benchmarks.items()}
+
+    samples = {key: [] for key in benchmarks}
+    calibration = {key: [] for key in benchmarks}
+    for _ in range(rounds):
+        for key, (op, corpus) in benchmarks.items():
+            times, calibrations = time_calibrated(op, corpus, calls[key],
+                                                  calibration_inner)
+            samples[key].append(times)
+            calibration[key].append(calibrations)
+
+    all_calibration = [[t for key in benchmarks for t in calibration[key][i]]
+                       for i in range(rounds)]
+    results = {CALIBRATION: summarize(all_calibration, 0)}
+    for key, (op, corpus) in benchmarks.items():
+        results[key] = summarize(samples[key], allocations(op, corpus),
+                                 calibration[key])
+    return results
+
+
+def relative_speed(results, baseline, key):
+    """Return the speed of a benchmark relative to the baseline, corrected
+    for the speed of the machine during each run as measured by the
+    calibration workload (1.0 means unchanged).
+    """
+    if "cost" in results[key] and "cost" in baseline[key]:
+        return baseline[key]["cost"] / results[key]["cost"]
+    # Baselines recorded without per-sample calibration
+    speed = results[key]["ops_per_sec"] / baseline[key]["ops_per_sec"]
+    if CALIBRATION in results and CALIBRATION in baseline:
+        speed /= (results[CALIBRATION]["ops_per_sec"] /
+                  baseline[CALIBRATION]["ops_per_sec"])
+    return speed
+
+
+def print_results(results, baseline=None, out=sys.stdout):
+    print("{:<36}{:>12}{:>10}{:>10}{:>10}{:>10}{:>10}".format(
+        "Benchmark", "ops/sec", "p50 us", "p90 us", "p99 us", "bytes",
+        "vs base"), file=out)
+    for key, result in results.items():
+        change = ""
+        if baseline and key in baseline and key != CALIBRATION:
+            change = "{:+.1f}%".format(
+                100 * (relative_speed(results, baseline, key) - 1))
+        print("{:<36}{:>12.0f}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.0f}{:>10}".format(
+            key, result["ops_per_sec"], result["p50_us"], result["p90_us"],
+            result["p99_us"], result["alloc_bytes"], change), file=out)
+
+
+def regressions(results, baseline, threshold=DEFAULT_THRESHOLD,
+                noise_floor_us=NOISE_FLOOR_US):
+    """Return the keys of the benchmarks that are more than `threshold`
+    slower than the baseline, after correcting for machine speed, and more
+    than `noise_floor_us` microseconds slower per call.
+    """
+    failed = []
+    for key in results:
+        if key == CALIBRATION or key not in baseline:
+            continue
+        speed = relative_speed(results, baseline, key)
+        slowdown_us = 1e6 / baseline[key]["ops_per_sec"] * (1 / speed - 1)
+        if speed < 1 - threshold and slowdown_us > noise_floor_us:
+            failed.append(key)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark Board primitives and heuristic functions.")
+    parser.add_argument("--board", choices=sorted(BOARD_CLASSES),
+                        action="append",
+                        help="board class to benchmark (default: all)")
+    parser.add_argument("--op", choices=sorted(OPERATIONS), action="append",
+                        help="operation to benchmark (default: all)")
+    parser.add_argument("--inner", type=int, default=200,
+                        help="minimum calls per timing sample (default: 200)")
+    parser.add_argument("--rounds", type=int, default=10,
+                        help="samples per position (default: 10)")
+    parser.add_argument("--baseline", default=BASELINE_FILE,
+                        help="baseline file (default: benchmark_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write the results to the baseline file")
+    parser.add_argument("--check", action="store_true",
+                        help="exit with status 1 if any benchmark regressed "
+                             "beyond the threshold")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown for --check (default: 0.2)")
+    parser.add_argument("--noise-floor", type=float, default=NOISE_FLOOR_US,
+                        help="smallest slowdown per call, in microseconds, "
+                             "reported by --check (default: {})".format(
+                                 NOISE_FLOOR_US))
+    args = parser.parse_args()
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = run(args.board or sorted(BOARD_CLASSES),
+                  args.op or list(OPERATIONS), args.inner, args.rounds)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print("\nSaved baseline to {}".format(args.baseline))
+
+    if args.check:
+        if baseline is None:
+            print("\nNo baseline found at {}".format(args.baseline))
+            sys.exit(1)
+        failed = regressions(results, baseline, args.threshold,
+                             args.noise_floor)
+        if failed:
+            # A slow period of the machine can outlast every round of a
+            # benchmark, so time the failures again and keep the faster
+            # result before reporting them
+            retry = run(args.board or sorted(BOARD_CLASSES),
+                        args.op or list(OPERATIONS), args.inner, args.rounds,
+                        only=set(failed))
+            for key in failed:
+                if (relative_speed(retry, baseline, key) >
+                        relative_speed(results, baseline, key)):
+                    results[key] = retry[key]
+            failed = regressions(results, baseline, args.threshold,
+                                 args.noise_floor)
+        if failed:
+            print("\nRegressions beyond {:.0%} of baseline:".format(
+                args.threshold))
+            for key in failed:
+                print("  " + key)
+            sys.exit(1)
+        print("\nNo regressions beyond {:.0%} of baseline.".format(
+            args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,17 @@ champions) in a tournament.
 
          COMPLETING AND SUBMITTING A COMPETITION AGENT IS OPTIONAL
 """
+import gc
+import math
 import random
 
+try:
+    from search_stats import SearchStats
+except ImportError:
+    # search_stats.py is not submitted with the agent, which then runs
+    # without instrumentation (see `CustomPlayer`)
+    SearchStats = None
+
 
 class SearchTimeout(Exception):
     """Subclass base exception for code clarity. """
@@ -36,13 +45,52 @@ def custom_score(game, player):
     raise NotImplementedError
 
 
+class Node:
+    """A node of the Monte Carlo search tree.
+
+    Attributes
+    ----------
+    move : (int, int)
+        The move leading to the node from its parent (None at the root).
+
+    key : int
+        The Zobrist key of the position of the node.
+
+    untried : list<(int, int)>
+        The legal moves of the position without a child node yet.
+
+    children : list<Node>
+        The expanded child nodes.
+
+    visits, wins : int
+        The number of playouts through the node, and how many of them were
+        won by the player who made `move`.
+    """
+    __slots__ = ("move", "key", "untried", "children", "visits", "wins")
+
+    def __init__(self, move, key, untried):
+        self.move = move
+        self.key = key
+        self.untried = untried
+        self.children = []
+        self.visits = 0
+        self.wins = 0
+
+
 class CustomPlayer:
     """Game-playing agent to use in the optional player vs player Isolation
     competition.
 
-    You must at least implement the get_move() method and a search function
-    to complete this class, but you may use any of the techniques discussed
-    in lecture or elsewhere on the web -- opening books, MCTS, etc.
+    The agent uses Monte Carlo tree search with the UCT selection rule: each
+    iteration descends the tree through the child maximizing
+
+        wins / visits + exploration * sqrt(ln(parent visits) / visits),
+
+    adds one new node, plays random moves from it until a player is stuck
+    (a rollout, using push_move/pop_move on a single board) and credits the
+    result to every node on the path. The most visited move is played, and
+    the subtree of the position reached after the opponent's reply is kept
+    for the next move.
 
     **************************************************************************
           THIS CLASS IS OPTIONAL -- IT IS ONLY USED IN THE ISOLATION PvP
@@ -55,16 +103,42 @@ class CustomPlayer:
         The name of the search method to use in get_move().
 
     timeout : float (optional)
-        Time remaining (in milliseconds) when search is aborted.  Note that
-        the PvP competition uses more accurate timers that are not cross-
-        platform compatible, so a limit of 1ms (vs 10ms for the other classes)
-        is generally sufficient.
+        Time remaining (in milliseconds) when search is aborted. The search
+        also stops early enough to finish its slowest iteration so far
+        before the limit, and rollouts check the clock as they go.
+
+    exploration : float (optional)
+        The exploration constant of the UCT rule.
+
+    reuse_tree : bool (optional)
+        If True, keep the search tree between moves of the same game.
+
+    instrument : bool (optional)
+        If True, collect `search_stats.SearchStats` counters for every
+        get_move() call (tree nodes added, rollouts, deepest tree path and
+        search time), available as `last_stats` and `total_stats` like the
+        players in `game_agent`. Ignored when search_stats.py is not
+        available (e.g. when the agent is submitted on its own).
+
+    seed : hashable (optional)
+        Seed of the random generator of the rollouts.
     """
 
-    def __init__(self, data=None, timeout=1.):
+    def __init__(self, data=None, timeout=10., exploration=math.sqrt(2),
+                 reuse_tree=True, instrument=False, seed=None):
         self.score = custom_score
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.exploration = exploration
+        self.reuse_tree = reuse_tree
+        self.instrument = instrument and SearchStats is not None
+        self.last_stats = None
+        self.total_stats = SearchStats() if self.instrument else None
+        self._rng = random.Random(seed)
+        self._root = None
+        # Estimated milliseconds of garbage collection per tree node added
+        # by a search (see get_move)
+        self._collect_cost = 1e-3
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -93,5 +167,166 @@ class CustomPlayer:
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        # OPTIONAL: Finish this function!
-        raise NotImplementedError
+        self.time_left = time_left
+        start = time_left()
+        # Rollouts pick moves at random themselves, so skip the shuffle
+        game = game.copy()
+        game.shuffle_moves = False
+        root = self.find_root(game)
+        if not root.untried and not root.children:
+            self._root = None
+            return (-1, -1)
+
+        rollouts = nodes = max_depth = 0
+        slowest = 0.
+        # A collection of the cyclic garbage collector over a large tree can
+        # take longer than the timer margin, so the collector is paused
+        # during the search (the tree has no reference cycles, since nodes do
+        # not point to their parent) and the young objects are collected at
+        # the end, within the time budget
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            left = start
+            while True:
+                # Stop when the slowest iteration so far and the final
+                # collection might not finish in time
+                margin = slowest + self._collect_cost * nodes
+                if left - self.TIMER_THRESHOLD < margin:
+                    break
+                try:
+                    added, depth = self.iterate(game, root)
+                except SearchTimeout:
+                    break
+                iteration_start, left = left, self.time_left()
+                slowest = max(slowest, iteration_start - left)
+                rollouts += 1
+                nodes += added
+                max_depth = max(max_depth, depth)
+        finally:
+            if gc_enabled:
+                gc.enable()
+                collect_start = self.time_left()
+                gc.collect(0)
+                if nodes:
+                    # Collection times vary a lot, so keep a slowly decaying
+                    # maximum rather than the last measurement
+                    cost = (collect_start - self.time_left()) / nodes
+                    self._collect_cost = max(cost, 0.9 * self._collect_cost)
+
+        if root.children:
+            best = max(root.children, key=lambda child: child.visits)
+        else:
+            # No iteration completed in time
+            best = Node(root.untried[0], None, [])
+        self._root = best if self.reuse_tree else None
+
+        if self.instrument:
+            search_time = (start - time_left()) / 1000
+            self.last_stats = SearchStats(moves=1, nodes=nodes,
+                                          rollouts=rollouts,
+                                          max_depth=max_depth,
+                                          search_time=search_time)
+            self.total_stats.merge(self.last_stats)
+        return best.move
+
+    def find_root(self, game):
+        """Return the tree node of the game position: the node of the
+        opponent's reply below the move played last time if the tree is
+        reused and the game continues from it, or a new node otherwise.
+        """
+        key = game.zobrist_key
+        if self._root is not None:
+            for child in self._root.children:
+                if child.key == key:
+                    return child
+        return Node(None, key, game.get_legal_moves())
+
+    def iterate(self, game, root):
+        """Run one select-expand-rollout-backpropagate iteration from the
+        root. The game is restored before returning.
+
+        Returns
+        -------
+        (int, int)
+            The number of nodes added to the tree (0 or 1) and the depth of
+            the tree path followed.
+        """
+        node = root
+        path = [root]
+        added = 0
+        try:
+            # Selection
+            while not node.untried and node.children:
+                node = self.select(node)
+                game.push_move(node.move)
+                path.append(node)
+            # Expansion
+            if node.untried:
+                untried = node.untried
+                idx = self._rng.randrange(len(untried))
+                untried[idx], untried[-1] = untried[-1], untried[idx]
+                move = untried.pop()
+                game.push_move(move)
+                child = Node(move, game.zobrist_key, game.get_legal_moves())
+                node.children.append(child)
+                path.append(child)
+                added = 1
+            try:
+                plies = self.rollout(game)
+            except SearchTimeout:
+                # Unvisited children must not be selected, so give the move
+                # back to the untried moves of its parent
+                if added:
+                    node.children.pop()
+                    node.untried.append(move)
+                raise
+        finally:
+            for _ in range(len(path) - 1):
+                game.pop_move()
+
+        # The player to move at the end of the rollout lost, so the player who
+        # moved into the new node won iff the rollout had an even length
+        reward = 1 if plies % 2 == 0 else 0
+        for node in reversed(path):
+            node.visits += 1
+            node.wins += reward
+            reward = 1 - reward
+        return added, len(path) - 1
+
+    def select(self, node):
+        """Return the child of a fully expanded node with the best UCT
+        score.
+        """
+        scale = self.exploration * math.sqrt(math.log(node.visits))
+        best = None
+        best_score = float("-inf")
+        for child in node.children:
+            visits = child.visits
+            score = child.wins / visits + scale / math.sqrt(visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def rollout(self, game):
+        """Play random moves until the player to move has no legal moves,
+        then undo them, and return the number of moves played. Raise
+        SearchTimeout if the timer runs out during the rollout.
+        """
+        choice = self._rng.choice
+        time_left = self.time_left
+        threshold = self.TIMER_THRESHOLD
+        plies = 0
+        try:
+            moves = game.get_legal_moves()
+            while moves:
+                game.push_move(choice(moves))
+                plies += 1
+                # Reading the clock costs about a tenth of a ply
+                if not plies % 8 and time_left() < threshold:
+                    raise SearchTimeout()
+                moves = game.get_legal_moves()
+        finally:
+            for _ in range(plies):
+                game.pop_move()
+        return plies
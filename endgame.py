@@ -0,0 +1,235 @@
+"""This file contains an exact solver for Isolation endgames in which the two
+players can no longer interfere with each other.
+
+Once the cells a player can still reach (by a knight-move flood fill over the
+blank cells) are disjoint from the cells its opponent can reach, each player
+is alone in its own region and the game reduces to who has the longer knight
+path: the active player with a longest path of `a` moves wins against an
+opponent with a longest path of `b` moves if and only if a > b, since it
+runs out of moves first on a tie. Longest paths are found by a depth-first
+search over (location, remaining cells) states, memoized so that paths
+reaching the same cells in a different order are only explored once. Only
+the winner matters, so the player with the smaller region is solved first
+and the search of the other player stops as soon as it finds a path that
+decides the game.
+
+Cells are represented as the bits of an integer, with the same indexing as
+`isolation.Board` (index = row + col * height).
+"""
+from isolation.isolation import knight_neighbors
+
+# Knight-move masks shared by every solver with the same geometry
+_MASK_CACHE = {}
+
+
+def knight_masks(width, height):
+    """Return a tuple with the bitmask of the cells a knight can reach from
+    each cell of a board of the given dimensions.
+    """
+    key = (width, height)
+    masks = _MASK_CACHE.get(key)
+    if masks is None:
+        masks = tuple(sum(1 << n for n, _ in neighbors)
+                      for neighbors in knight_neighbors(width, height))
+        _MASK_CACHE[key] = masks
+    return masks
+
+
+def _popcount(mask):
+    return bin(mask).count("1")
+
+
+def region(masks, loc, free, stop=0):
+    """Return the bitmask of the free cells reachable by a sequence of knight
+    moves from the cell loc, or None as soon as one of the cells of the
+    bitmask stop is reached.
+    """
+    seen = 0
+    frontier = masks[loc] & free
+    while frontier:
+        if frontier & stop:
+            return None
+        seen |= frontier
+        reach = 0
+        while frontier:
+            low = frontier & -frontier
+            reach |= masks[low.bit_length() - 1]
+            frontier ^= low
+        frontier = reach & free & ~seen
+    return seen
+
+
+class EndgameSolver:
+    """Partition detector and longest path solver for `AlphaBetaPlayer`.
+
+    Results are cached by the Zobrist key of the position and longest paths
+    by (location, free cells), so repeated iterative deepening iterations
+    and later moves of the same game reuse earlier work. The caches are not
+    pickled.
+
+    Parameters
+    ----------
+    max_region : int (optional)
+        Positions where a player's region has more cells than this are not
+        solved, as the longest path search may take too long.
+
+    min_depth : int (optional)
+        The search only consults the solver at nodes with at least this many
+        plies left to search, where the cost of the flood fill is small
+        compared to the subtree it can replace.
+
+    max_entries : int (optional)
+        The caches are cleared when they hold more entries than this.
+    """
+
+    def __init__(self, max_region=32, min_depth=2, max_entries=2**20):
+        self.max_region = max_region
+        self.min_depth = min_depth
+        self.max_entries = max_entries
+        self.solved = 0
+        self._positions = {}
+        self._paths = {}
+        self._bounds = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_positions"] = {}
+        state["_paths"] = {}
+        state["_bounds"] = {}
+        return state
+
+    def solve(self, game, check=None):
+        """Solve the position if the players are in disconnected regions.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            The position to solve.
+
+        check : callable (optional)
+            Called once for every new longest path state explored, e.g. to
+            abort the search by raising an exception when time runs out.
+
+        Returns
+        -------
+        (int, int, (int, int)) or None
+            The length of the longest path of the active player and of the
+            inactive player, and the first move of that path of the active
+            player ((-1, -1) if it has no legal moves). The length of the
+            winner's path may be a lower bound that is enough to win: when
+            the active player wins, the move starts a path longer than the
+            opponent's, not necessarily the longest one. None if the regions
+            of the players are connected, if a player is not on the board
+            yet, or if a region has more than max_region cells.
+        """
+        key = game.zobrist_key
+        if key in self._positions:
+            return self._positions[key]
+        if len(self._positions) > self.max_entries:
+            self._positions.clear()
+        solution = self._solve(game, check)
+        self._positions[key] = solution
+        if solution is not None:
+            self.solved += 1
+        return solution
+
+    def value(self, game, check=None):
+        """Return +inf if the active player wins the position, -inf if it
+        loses, or None if the position is not solved (see `solve`).
+        """
+        solution = self.solve(game, check)
+        if solution is None:
+            return None
+        return float("inf") if solution[0] > solution[1] else float("-inf")
+
+    def _solve(self, game, check):
+        active_loc = game.get_player_location(game.active_player)
+        inactive_loc = game.get_player_location(game.inactive_player)
+        if active_loc is None or inactive_loc is None:
+            return None
+        height = game.height
+        masks = knight_masks(game.width, height)
+        free = game.blank_mask()
+        active_idx = active_loc[0] + active_loc[1] * height
+        inactive_idx = inactive_loc[0] + inactive_loc[1] * height
+        # The regions are connected if and only if the active player can
+        # reach a cell next to the inactive player, so the flood fill stops
+        # early in most positions that are not endgames
+        active_region = region(masks, active_idx, free,
+                               masks[inactive_idx] & free)
+        if active_region is None:
+            return None
+        inactive_region = region(masks, inactive_idx, free)
+        active_size = _popcount(active_region)
+        inactive_size = _popcount(inactive_region)
+        if max(active_size, inactive_size) > self.max_region:
+            return None
+
+        target = None
+        if active_size > inactive_size:
+            inactive_length = self.longest_path(masks, inactive_idx,
+                                                inactive_region, check)
+            # Any path longer than the opponent's wins
+            target = inactive_length + 1
+        best_length, best_move = 0, (-1, -1)
+        moves = masks[active_idx] & active_region
+        while moves:
+            low = moves & -moves
+            moves ^= low
+            idx = low.bit_length() - 1
+            length = 1 + self.longest_path(
+                masks, idx, active_region ^ low, check,
+                None if target is None else target - 1)
+            if length > best_length:
+                best_length, best_move = length, (idx % height, idx // height)
+                if target is not None and best_length >= target:
+                    break
+        if target is None:
+            # Any path as long as the active player's wins for the opponent
+            inactive_length = self.longest_path(masks, inactive_idx,
+                                                inactive_region, check,
+                                                best_length)
+        return best_length, inactive_length, best_move
+
+    def longest_path(self, masks, loc, free, check=None, target=None):
+        """Return the number of moves of the longest knight path from the
+        cell loc through the free cells (each visited at most once).
+
+        If target is given, the search stops as soon as it finds a path of
+        at least target moves, and the result is then only a lower bound of
+        the longest path (but still at least target).
+        """
+        key = (loc, free)
+        paths = self._paths
+        if key in paths:
+            return paths[key]
+        if target is not None:
+            if target <= 0:
+                return 0
+            bounds = self._bounds
+            if bounds.get(key, -1) >= target:
+                return bounds[key]
+        if check is not None:
+            check()
+        if len(paths) > self.max_entries:
+            paths.clear()
+        if len(self._bounds) > self.max_entries:
+            self._bounds.clear()
+        # No path is longer than the number of free cells
+        bound = _popcount(free)
+        best = 0
+        moves = masks[loc] & free
+        while moves and best < bound:
+            low = moves & -moves
+            moves ^= low
+            length = 1 + self.longest_path(
+                masks, low.bit_length() - 1, free ^ low, check,
+                None if target is None else target - 1)
+            if length > best:
+                best = length
+                if target is not None and best >= target and best < bound:
+                    # Stopped early, so the result is only a lower bound
+                    self._bounds[key] = best
+                    return best
+        paths[key] = best
+        return best
@@ -0,0 +1,189 @@
+"""This file contains a caching layer for the score functions of
+`game_agent` and `sample_players`.
+
+`EvalCache` wraps a score function and remembers its value for every
+(position, player) pair it evaluates, keyed by the Zobrist key of the
+position and whether the player is the active player (which together
+identify the seat of the player), in a bounded least-recently-used table.
+Repeated evaluations come from transpositions and, above all, from the
+searches of later moves of the same game, whose shallow iterations reach
+the leaves of the deeper iterations of earlier moves:
+
+    player = AlphaBetaPlayer(score_fn=EvalCache(custom_score))
+    ...
+    print(player.score.hit_rate)
+
+With memoize_moves=True, the score function is called on a miss with a
+`MoveMemo` view of the board, which generates (or counts) the legal moves of
+each player at most once per evaluation however many times the score
+function asks for them (directly or through is_winner, is_loser and
+utility).
+
+The cache itself costs about as much as one legal move generation per call,
+so it pays off for score functions that are more expensive than the simple
+mobility heuristics of `sample_players`.
+"""
+from collections import OrderedDict
+
+
+class MoveMemo:
+    """Read-only view of a board that memoizes the legal moves and the
+    number of legal moves of each player for the lifetime of the view.
+    Every other attribute is read from the board. The view must not outlive
+    a change of the board, and the lists it returns must not be modified.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The position to evaluate.
+    """
+
+    __slots__ = ("_game", "_moves", "_counts")
+
+    def __init__(self, game):
+        self._game = game
+        self._moves = {}
+        self._counts = {}
+
+    def __getattr__(self, name):
+        return getattr(self._game, name)
+
+    # The attributes read by most score functions are forwarded explicitly,
+    # which is much cheaper than the __getattr__ fallback
+    @property
+    def active_player(self):
+        return self._game.active_player
+
+    @property
+    def inactive_player(self):
+        return self._game.inactive_player
+
+    def get_opponent(self, player):
+        return self._game.get_opponent(player)
+
+    def get_player_location(self, player):
+        return self._game.get_player_location(player)
+
+    def get_legal_moves(self, player=None):
+        """Return the legal moves of the player (the active player if None),
+        generating them on the first call only.
+        """
+        if player is None:
+            player = self._game.active_player
+        try:
+            return self._moves[player]
+        except KeyError:
+            moves = self._moves[player] = self._game.get_legal_moves(player)
+            return moves
+
+    def count_legal_moves(self, player=None):
+        """Return the number of legal moves of the player (the active player
+        if None), counting them on the first call only.
+        """
+        if player is None:
+            player = self._game.active_player
+        moves = self._moves.get(player)
+        if moves is not None:
+            return len(moves)
+        try:
+            return self._counts[player]
+        except KeyError:
+            count = self._counts[player] = self._game.count_legal_moves(player)
+            return count
+
+    def has_legal_move(self, player=None):
+        """ Test whether the player has at least one legal move. """
+        return self.count_legal_moves(player) > 0
+
+    def is_winner(self, player):
+        """ Test whether the specified player has won the game. """
+        active = self._game.active_player
+        return player != active and not self.count_legal_moves(active)
+
+    def is_loser(self, player):
+        """ Test whether the specified player has lost the game. """
+        active = self._game.active_player
+        return player == active and not self.count_legal_moves(active)
+
+    def utility(self, player):
+        """Return +inf if the player has won, -inf if it has lost and 0
+        otherwise.
+        """
+        if self.is_winner(player):
+            return float("inf")
+        if self.is_loser(player):
+            return float("-inf")
+        return 0.
+
+
+class EvalCache:
+    """Least-recently-used cache of the values of a score function.
+
+    Instances are called like the wrapped score function, so they can be
+    passed as the score_fn of any player. The entries are not pickled, so
+    players sent to other processes start with an empty cache.
+
+    Parameters
+    ----------
+    score_fn : callable
+        The score function to cache, with the signature
+        score_fn(game, player) -> float.
+
+    max_entries : int (optional)
+        The least recently used entry is evicted when the cache holds more
+        values than this.
+
+    memoize_moves : bool (optional)
+        If True, call score_fn with a `MoveMemo` view of the board so that
+        the legal moves of each player are generated at most once per
+        evaluation.
+    """
+
+    def __init__(self, score_fn, max_entries=2**18, memoize_moves=False):
+        self.score_fn = score_fn
+        self.max_entries = max_entries
+        self.memoize_moves = memoize_moves
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self.__name__ = getattr(score_fn, "__name__", type(self).__name__)
+        self.__doc__ = getattr(score_fn, "__doc__", None)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_values"] = OrderedDict()
+        return state
+
+    def __len__(self):
+        return len(self._values)
+
+    def __call__(self, game, player):
+        # Zobrist keys are non-negative, so the complement keys the values
+        # of the active player apart without allocating a tuple
+        key = game.zobrist_key
+        if player == game.active_player:
+            key = ~key
+        values = self._values
+        if key in values:
+            self.hits += 1
+            values.move_to_end(key)
+            return values[key]
+        self.misses += 1
+        value = self.score_fn(MoveMemo(game) if self.memoize_moves else game,
+                              player)
+        values[key] = value
+        if len(values) > self.max_entries:
+            values.popitem(last=False)
+        return value
+
+    @property
+    def hit_rate(self):
+        """The fraction of the calls answered from the cache. """
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.
+
+    def clear(self):
+        """Remove every entry and reset the hit and miss counters. """
+        self._values.clear()
+        self.hits = 0
+        self.misses = 0
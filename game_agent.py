@@ -4,12 +4,38 @@ and include the results in your report.
 """
 import random
 
+from math import isinf, nextafter
+
+try:
+    from search_stats import SearchStats, timer
+except ImportError:
+    # search_stats.py is not submitted with the agent, which then runs
+    # without instrumentation (see `SearchPlayer`)
+    SearchStats = timer = None
+
+
+# Flags of transposition table entries telling how the stored value bounds
+# the minimax value of the position (the same as in `transposition`)
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
 
 class SearchTimeout(Exception):
     """Subclass base exception for code clarity. """
     pass
 
 
+# Stand-ins for the agents of a position sent to the worker processes of a
+# parallel search (see `AlphaBetaPlayer.parallel_search`)
+ROOT_PLAYER = "root player"
+ROOT_OPPONENT = "root opponent"
+
+# Number of endgame solver states explored between two clock readings (see
+# `AlphaBetaPlayer.check_endgame`)
+ENDGAME_CHECK_INTERVAL = 64
+
+
 def custom_score(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -40,7 +66,7 @@ def custom_score(game, player):
     if game.is_winner(player):
         return float("inf")
 
-    own_moves = len(game.get_legal_moves(player))
+    own_moves = game.count_legal_moves(player)
     # With tons of options, take a good position. I normalize the center_score
     #to 8. The max distance is 18.5, and there are a max of 8 moves in general
     if own_moves > 5:
@@ -48,11 +74,11 @@ def custom_score(game, player):
     # With moderate options, find areas to increase relative moves vs opponent
     # This was copied from the sample_players.py example
     elif own_moves > 2:
-        opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+        opp_moves = game.count_legal_moves(game.get_opponent(player))
         return float(own_moves - opp_moves)
     # With limited options, go for the kill
     else:
-        opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+        opp_moves = game.count_legal_moves(game.get_opponent(player))
         return float(own_moves - 2 * opp_moves)
 
 
@@ -84,7 +110,7 @@ def custom_score_2(game, player):
     if game.is_winner(player):
         return float("inf")
 
-    own_moves = len(game.get_legal_moves(player))
+    own_moves = game.count_legal_moves(player)
     # Goal is to not penalize, in any way, moves that will lead to large number
     # of potential movements. This was copied from sample_players.py example
     if own_moves > 5:
@@ -94,7 +120,7 @@ def custom_score_2(game, player):
         return float(own_moves - (8.0 / 18.5) * center_score(game,player))
     # With limited options, go for the kill
     else:
-        opp_moves = len(game.get_legal_moves(game.get_opponent(player)))
+        opp_moves = game.count_legal_moves(game.get_opponent(player))
         return float(own_moves - 2 * opp_moves)
 
 def custom_score_3(game, player):
@@ -127,7 +153,7 @@ def custom_score_3(game, player):
     if game.is_winner(player):
         return float("inf")
 
-    return float(len(game.get_legal_moves(player)))
+    return float(game.count_legal_moves(player))
 
 def center_score(game, player):
     """Calculates a score for how close to the center a player's move is.
@@ -155,7 +181,7 @@ def center_score(game, player):
 
 def terminal_test(game):
     # Returns True if the game is over, False otherwise
-    return len(game.get_legal_moves()) == 0
+    return not game.has_legal_move()
 
 def set_best_move(game):
     # Returns a legal move if there are any, (-1,-1) if not
@@ -165,6 +191,23 @@ def set_best_move(game):
     else:
         return game.get_legal_moves()[0]
 
+def tt_flag(value, alpha, beta):
+    # Returns whether a value searched with the (alpha, beta) window is an
+    # exact value, a lower bound (fail high) or an upper bound (fail low)
+    if value <= alpha:
+        return UPPER
+    if value >= beta:
+        return LOWER
+    return EXACT
+
+def tt_first(moves, move):
+    # Moves the best move cached in the transposition table to the front of
+    # the list so it is searched first, since it most often causes a cutoff
+    if move is not None and move in moves:
+        moves.remove(move)
+        moves.insert(0, move)
+    return moves
+
 
 class IsolationPlayer:
     """Base class for minimax and alphabeta agents -- this class is never
@@ -196,7 +239,168 @@ class IsolationPlayer:
         self.TIMER_THRESHOLD = timeout
 
 
-class MinimaxPlayer(IsolationPlayer):
+class SearchPlayer(IsolationPlayer):
+    """Base class holding the machinery shared by the minimax and alphabeta
+    agents on top of `IsolationPlayer`.
+
+    Parameters
+    ----------
+    search_depth, score_fn, timeout
+        See `IsolationPlayer`.
+
+    instrument : bool (optional)
+        If True, collect `search_stats.SearchStats` counters (nodes, leaf
+        evaluations, cutoffs, completed depth and time spent in evaluation
+        and move generation) for every get_move() call. The counters of the
+        last call are available as `last_stats` and the running total over
+        all calls as `total_stats`. Ignored when search_stats.py is not
+        available (e.g. when the agent is submitted on its own).
+
+    node_limit : int (optional)
+        Maximum number of nodes visited by one get_move() call. The search
+        stops as if it had timed out when the budget is exhausted.
+
+    depth_limit : int (optional)
+        Maximum search depth: the depth of the fixed-depth minimax search
+        (instead of search_depth), or of the last iterative deepening
+        iteration.
+
+    use_clock : bool (optional)
+        If False, ignore time_left() and bound the search only by node_limit
+        and depth_limit, so that the moves chosen do not depend on the speed
+        or load of the machine (the game must then be played without a time
+        limit).
+
+    max_check_interval : int (optional)
+        Maximum number of nodes visited between two calls to time_left().
+        The actual interval is recalibrated at every check from the measured
+        node rate, so that the next check is due after at most half of the
+        time left before the TIMER_THRESHOLD margin, and shrinks to one node
+        as the deadline approaches. 1 checks the clock at every node.
+
+    opening_book : `opening_book.OpeningBook` (optional)
+        A book of precomputed moves consulted before searching: positions
+        found in the book are answered with the book move without a search.
+    """
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=15.,
+                 instrument=False, node_limit=None, depth_limit=None,
+                 use_clock=True, max_check_interval=32, opening_book=None):
+        super().__init__(search_depth, score_fn, timeout)
+        if not use_clock and node_limit is None and depth_limit is None:
+            raise ValueError("A search without the clock needs a node_limit "
+                             "or a depth_limit.")
+        self.instrument = instrument and SearchStats is not None
+        self.node_limit = node_limit
+        self.depth_limit = depth_limit
+        self.use_clock = use_clock
+        self.max_check_interval = max(1, max_check_interval)
+        self.book = opening_book
+        self.nodes = 0
+        self._check_countdown = 1
+        self._last_check = None
+        self.stats = None
+        self.last_stats = None
+        self.total_stats = SearchStats() if self.instrument else None
+
+    def start_stats(self):
+        # Resets the node count and clock checks and starts collecting the
+        # counters of one get_move() call
+        self.nodes = 0
+        self._check_countdown = 1
+        self._last_check = None
+        if self.instrument:
+            self.stats = SearchStats(moves=1, search_time=timer())
+
+    def finish_stats(self):
+        # Stops collecting counters and adds them to the running total
+        stats = self.stats
+        if stats is not None:
+            stats.nodes = self.nodes
+            stats.search_time = timer() - stats.search_time
+            self.last_stats = stats
+            self.total_stats.merge(stats)
+            self.stats = None
+
+    def check_budget(self):
+        # Counts a visited node and raises SearchTimeout when the node budget
+        # is exhausted or the timer is about to expire. The clock is only
+        # read when the countdown set by the previous check runs out.
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchTimeout()
+        if self.use_clock:
+            self._check_countdown -= 1
+            if self._check_countdown <= 0:
+                self.check_clock()
+
+    def check_clock(self):
+        # Raises SearchTimeout if the timer is about to expire, otherwise
+        # schedules the next clock check from the node rate measured since
+        # the last one, leaving at least half of the remaining slack unused
+        time_left = self.time_left()
+        slack = time_left - self.TIMER_THRESHOLD
+        if slack < 0:
+            raise SearchTimeout()
+        interval = 1
+        if self._last_check is not None:
+            last_nodes, last_time_left = self._last_check
+            elapsed = last_time_left - time_left
+            if elapsed > 0:
+                rate = (self.nodes - last_nodes) / elapsed
+                interval = min(self.max_check_interval, rate * slack / 2)
+            else:
+                interval = 2 * (self.nodes - last_nodes)
+        self._check_countdown = max(1, int(min(self.max_check_interval,
+                                               interval)))
+        self._last_check = (self.nodes, time_left)
+
+    def book_move(self, game):
+        # Returns the opening book move of the position if it is legal, or
+        # None if there is no book or the position is not in it
+        if self.book is None:
+            return None
+        move = self.book.lookup(game)
+        if move is not None and move in game.get_legal_moves():
+            return move
+        return None
+
+    def is_leaf(self, game, depth):
+        # Returns True if the search must stop and evaluate the node, either
+        # because of the depth limit or the end of game
+        stats = self.stats
+        if stats is None:
+            return (depth == 0) | terminal_test(game)
+        start = timer()
+        terminal = terminal_test(game)
+        stats.movegen_time += timer() - start
+        return (depth == 0) | terminal
+
+    def legal_moves(self, game):
+        # Returns the legal moves of the active player, timing the call when
+        # instrumented
+        stats = self.stats
+        if stats is None:
+            return game.get_legal_moves()
+        start = timer()
+        moves = game.get_legal_moves()
+        stats.movegen_time += timer() - start
+        return moves
+
+    def evaluate(self, game):
+        # Returns self.score() of the position, timing the call when
+        # instrumented
+        stats = self.stats
+        if stats is None:
+            return self.score(game, self)
+        stats.leaf_evals += 1
+        start = timer()
+        value = self.score(game, self)
+        stats.eval_time += timer() - start
+        return value
+
+
+class MinimaxPlayer(SearchPlayer):
     """Game-playing agent that chooses a move using depth-limited minimax
     search. You must finish and test this player to make sure it properly uses
     minimax to return a good move before the search time limit expires.
@@ -231,8 +435,20 @@ class MinimaxPlayer(IsolationPlayer):
             (-1, -1) if there are no available legal moves.
         """
         self.time_left = time_left
+        self.start_stats()
+        try:
+            return self.search(game)
+        finally:
+            self.finish_stats()
+
+    def search(self, game):
+        """Return the move selected by get_move() for the position. """
+        move = self.book_move(game)
+        if move is not None:
+            return move
+
         #  Start in center
-        if len(game.get_legal_moves()) > 8:
+        if game.count_legal_moves() > 8:
             if (3,3) in game.get_legal_moves(): return (3,3)
             if (3,2) in game.get_legal_moves(): return (3,2)
 
@@ -243,7 +459,13 @@ class MinimaxPlayer(IsolationPlayer):
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
-            return self.minimax(game, self.search_depth)
+            depth = self.search_depth
+            if self.depth_limit is not None:
+                depth = self.depth_limit
+            best_move = self.minimax(game, depth)
+            if self.stats is not None:
+                self.stats.max_depth = depth
+            return best_move
 
         except SearchTimeout:
             pass  # Handle any actions required after timeout as needed
@@ -294,16 +516,21 @@ class MinimaxPlayer(IsolationPlayer):
                 raise SearchTimeout()
 
         """
-        #Check if out of time
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        #Check if out of time or nodes
+        self.check_budget()
 
         #Set a to a valid move to start in case function cannot find one in time
         a = set_best_move(game)
         v = float("-inf")
         #print(game.get_legal_moves())
-        for m in game.get_legal_moves():
-            contender = self.mm_value(game.forecast_move(m),depth-1, False)
+        for m in self.legal_moves(game):
+            # Search the move in-place and undo it afterwards (even on a
+            # SearchTimeout) instead of allocating a forecast_move() copy
+            game.push_move(m)
+            try:
+                contender = self.mm_value(game, depth-1, False)
+            finally:
+                game.pop_move()
             if contender > v:
                 v = contender
                 a = m
@@ -314,30 +541,154 @@ class MinimaxPlayer(IsolationPlayer):
         pseudocode example for MAX and MIN in the textbook. I combined these
         functions to let me make a change in one place to fix both.
         """
-        #Check if out of time
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
-        if (depth == 0) | terminal_test(game):
-            return self.score(game, self)
+        #Check if out of time or nodes
+        self.check_budget()
+        if self.is_leaf(game, depth):
+            return self.evaluate(game)
         #This sets up v properly depending on if this is a max or min calc
         if is_max:
             v = float("-inf")
         else:
             v = float("inf")
-        for m in game.get_legal_moves():
+        for m in self.legal_moves(game):
             #Determines if we should recur into a MIN or MAX mode next
-            if is_max:
-                v = max(v, self.mm_value(game.forecast_move(m),depth-1,False))
-            else:
-                v = min(v, self.mm_value(game.forecast_move(m),depth-1,True))
+            game.push_move(m)
+            try:
+                if is_max:
+                    v = max(v, self.mm_value(game,depth-1,False))
+                else:
+                    v = min(v, self.mm_value(game,depth-1,True))
+            finally:
+                game.pop_move()
         return v
 
-class AlphaBetaPlayer(IsolationPlayer):
+class AlphaBetaPlayer(SearchPlayer):
     """Game-playing agent that chooses a move using iterative deepening minimax
     search with alpha-beta pruning. You must finish and test this player to
     make sure it returns a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    search_depth, score_fn, timeout, instrument, node_limit, depth_limit,
+    use_clock, max_check_interval, opening_book
+        See `SearchPlayer`.
+
+    tt_size_mb : float (optional)
+        Memory budget in megabytes of the transposition table used to reuse
+        results of positions reached by different move orders and from
+        earlier iterative deepening iterations. 0 disables the table.
+
+    persist_tt : bool (optional)
+        If True, keep the transposition table between moves of the same game
+        instead of clearing it at the start of every get_move() call.
+
+    move_orderer : object (optional)
+        A `move_ordering.MoveOrderer` (or compatible object) used to search
+        the principal variation, killer and high-history moves first. If
+        None, moves are searched in the order returned by the board (after
+        the transposition table move, if any).
+
+    ponder : bool (optional)
+        If True, search on the opponent's time: `Board.play(ponder=True)`
+        calls start_pondering() when the opponent's turn begins and
+        stop_pondering() when it ends, and in between a background thread
+        searches the position after the predicted opponent reply (the best
+        reply stored in the transposition table) or, without a prediction,
+        the current position. The results are reused through the
+        transposition table, so pondering requires tt_size_mb and implies
+        persist_tt. The thread competes for the interpreter with an
+        opponent searching in the same process, so `Board.play` (and hence
+        the tournament) does not ponder by default; it pays off against
+        opponents whose time is spent outside this process.
+
+    workers : int (optional)
+        Number of worker processes searching the root moves in parallel. If
+        greater than 1, the legal moves of the root are split across a
+        process pool (created on first use; see `close`), each worker runs
+        its own iterative deepening search of its moves with a private
+        transposition table until the shared deadline, and the best move of
+        the deepest iteration completed by every worker is played. The
+        node_limit then applies to each worker separately.
+
+    endgame_solver : object (optional)
+        An `endgame.EndgameSolver` used once the players are in disconnected
+        regions of the board: the root move is then taken from the exact
+        solution, and searched nodes that are solved return +inf or -inf as
+        if they were terminal. Solving the root may take at most half of the
+        time left; if it does not finish, the position is searched normally.
+        Solver states are not counted as search nodes, but the node_limit
+        also bounds the states explored by the solver.
+
+    tt_symmetry_plies : int (optional)
+        Positions with fewer moves played than this are stored in the
+        transposition table under their `isolation.symmetry.canonical_key`,
+        so that rotations and reflections of a position share one entry.
+        Canonical keys cost a pass over the board per symmetry, so this
+        pays off only in the first plies of the game, where most symmetric
+        transpositions occur. Note that a score function that is not
+        symmetric (e.g. one measuring the distance to an off-center cell)
+        can then read the value of a mirrored position. 0 disables it.
+
+    pvs : bool (optional)
+        If True, use principal variation search: the first (best ordered)
+        move of every node is searched with the full window and the others
+        with a null window that only proves they are not better, searching
+        a move again with the full window when the proof fails. This pays
+        off when the move ordering (transposition table, move_orderer) is
+        good.
+
+    aspiration_window : float (optional)
+        If set, every iterative deepening iteration after the first starts
+        with the window (v - aspiration_window, v + aspiration_window)
+        around the value v of the previous iteration, and the side of the
+        window that fails is widened to infinity before searching again.
+        None searches every iteration with the full window. Only used by
+        the serial search (workers=1).
+
+    time_manager : object (optional)
+        A `time_manager.TimeManager` consulted between iterative deepening
+        iterations of the serial search: the search stops early when the
+        next iteration is not predicted to complete before the timer
+        expires. Ignored when use_clock is False.
     """
 
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=15.,
+                 instrument=False, node_limit=None, depth_limit=None,
+                 use_clock=True, max_check_interval=32, tt_size_mb=0,
+                 persist_tt=False, move_orderer=None, ponder=False,
+                 workers=1, endgame_solver=None, opening_book=None,
+                 tt_symmetry_plies=0, pvs=False, aspiration_window=None,
+                 time_manager=None):
+        super().__init__(search_depth, score_fn, timeout, instrument,
+                         node_limit, depth_limit, use_clock,
+                         max_check_interval, opening_book)
+        if ponder and not tt_size_mb:
+            raise ValueError("Pondering requires a transposition table "
+                             "(tt_size_mb > 0).")
+        self.tt_size_mb = tt_size_mb
+        self.tt = None
+        if tt_size_mb:
+            from transposition import TranspositionTable
+            self.tt = TranspositionTable(tt_size_mb)
+        self.persist_tt = persist_tt or ponder
+        self.tt_symmetry_plies = tt_symmetry_plies
+        self.pvs = pvs
+        self.aspiration_window = aspiration_window
+        self.time_manager = time_manager
+        self.ponder = ponder
+        self._pondering = None
+        self._tt_move_count = None
+        self.orderer = move_orderer
+        self.workers = max(1, workers)
+        self._executor = None
+        self.endgame = endgame_solver
+        # Time left (in milliseconds) at which the endgame solver is stopped,
+        # and the states it explored during the current get_move() call
+        self._endgame_reserve = self.TIMER_THRESHOLD
+        self._endgame_states = 0
+        self._root_depth = 0
+        self.root_value = None
+
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -368,9 +719,89 @@ class AlphaBetaPlayer(IsolationPlayer):
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
+        self.stop_pondering()
         self.time_left = time_left
+        self.start_stats()
+        try:
+            return self.search(game)
+        finally:
+            self.finish_stats()
+
+    def start_stats(self):
+        super().start_stats()
+        self._endgame_states = 0
+
+    def start_pondering(self, game):
+        """Start searching in a background thread while the opponent thinks
+        about its move in the given position. Does nothing unless the player
+        was created with ponder=True.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            A copy of the game at the start of the opponent's turn. The
+            pondering thread modifies it.
+        """
+        if not self.ponder:
+            return
+        import threading
+
+        self.stop_pondering()
+        stop = threading.Event()
+        self.time_left = lambda: float("-inf") if stop.is_set() else float("inf")
+        self.nodes = 0
+        self._check_countdown = 1
+        self._last_check = None
+        self._endgame_states = 0
+        thread = threading.Thread(target=self.ponder_search, args=(game,),
+                                  daemon=True)
+        self._pondering = (thread, stop)
+        thread.start()
+
+    def stop_pondering(self):
+        """Stop the pondering thread, if any, and wait for it to finish. """
+        if self._pondering is None:
+            return
+        thread, stop = self._pondering
+        stop.set()
+        thread.join()
+        self._pondering = None
+
+    def ponder_search(self, game):
+        """Iterative deepening search run by the pondering thread until it is
+        stopped. The results are left in the transposition table.
+        """
+        entry = self.tt_probe(game)[1]
+        reply = entry[4] if entry is not None else None
+        if reply is not None and reply in game.get_legal_moves():
+            game.apply_move(reply)
+        else:
+            reply = None
+        horizon = len(game.get_blank_spaces())
+        depth = 1
+        try:
+            while ((self.depth_limit is None or depth <= self.depth_limit) and
+                   depth <= horizon):
+                if reply is not None:
+                    # Search our answer to the predicted reply
+                    self.alphabeta(game, depth)
+                else:
+                    # Search every reply of the opponent
+                    self._root_depth = depth
+                    self.ab_value(game, float("-inf"), float("inf"), depth,
+                                  False)
+                depth += 1
+        except SearchTimeout:
+            pass
+
+    def search(self, game):
+        """Return the move selected by get_move() for the position. """
+        move = self.book_move(game)
+        if move is not None:
+            return move
+
         # Start in center
-        if len(game.get_legal_moves()) > 8:
+        if game.count_legal_moves() > 8:
             if (3,3) in game.get_legal_moves(): return (3,3)
             if (3,2) in game.get_legal_moves(): return (3,2)
 
@@ -378,13 +809,41 @@ class AlphaBetaPlayer(IsolationPlayer):
         # in case the search fails due to timeout. I made this change based on
         # feedback from the Udacity forum
         best_move = set_best_move(game)
+        if self.endgame is not None:
+            solution = self.solve_endgame(game)
+            if solution is not None:
+                return solution[2]
+        if self.workers > 1:
+            return self.parallel_search(game, best_move)
+        self.prepare_tt(game)
+        if self.orderer is not None:
+            self.orderer.new_search()
+        self.root_value = None
+        # No line of play is longer than the number of blank cells, so deeper
+        # iterations cannot change the result
+        horizon = len(game.get_blank_spaces())
+        manager = self.time_manager if self.use_clock else None
+        if manager is not None:
+            manager.start(self.time_left() - self.TIMER_THRESHOLD,
+                          game.count_legal_moves(), horizon)
         depth = 1
-        while True:
+        while ((self.depth_limit is None or depth <= self.depth_limit) and
+               depth <= horizon):
             try:
                 # The try/except block will automatically catch the exception
                 # raised when the timer is about to expire.
-                best_move = self.alphabeta(game, depth)
+                best_move = self.aspiration_search(game, depth)
+                if self.stats is not None:
+                    self.stats.max_depth = depth
                 depth += 1
+                if manager is not None:
+                    # Don't start an iteration that is predicted to be cut
+                    # short by the timer
+                    time_left = self.time_left() - self.TIMER_THRESHOLD
+                    manager.iteration_done(depth - 1, self.nodes, time_left,
+                                           best_move)
+                    if manager.should_stop(time_left):
+                        return best_move
 
             except SearchTimeout:
                 #In case there is a SearchTimeout in a function called via try
@@ -394,7 +853,153 @@ class AlphaBetaPlayer(IsolationPlayer):
         # Return the best move from the last completed search iteration
         return best_move
 
-    def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
+    def solve_endgame(self, game):
+        """Return the solution of the root position by the endgame solver
+        (see `endgame.EndgameSolver.solve`), or None if the players are not
+        separated or if the solver does not finish within half of the time
+        left, which is then left to the search.
+        """
+        if self.use_clock:
+            slack = self.time_left() - self.TIMER_THRESHOLD
+            self._endgame_reserve = self.TIMER_THRESHOLD + slack / 2
+        try:
+            return self.endgame.solve(game, self.check_endgame)
+        except SearchTimeout:
+            return None
+        finally:
+            self._endgame_reserve = self.TIMER_THRESHOLD
+
+    def check_endgame(self):
+        """Raise SearchTimeout when the endgame solver must stop: when the
+        time left falls below the reserve of the current solve (read every
+        ENDGAME_CHECK_INTERVAL states), or when it explored more states than
+        the node_limit during this get_move() call.
+        """
+        self._endgame_states += 1
+        if (self.node_limit is not None and
+                self._endgame_states > self.node_limit):
+            raise SearchTimeout()
+        if (self.use_clock and
+                not self._endgame_states % ENDGAME_CHECK_INTERVAL and
+                self.time_left() < self._endgame_reserve):
+            raise SearchTimeout()
+
+    def aspiration_search(self, game, depth):
+        """Return the best move of an alphabeta() search of the position to
+        the given depth, within an aspiration window around the value of the
+        previous iteration (root_value) if aspiration_window is set.
+        """
+        guess = self.root_value
+        if self.aspiration_window is None or guess is None or isinf(guess):
+            return self.alphabeta(game, depth)
+        alpha = guess - self.aspiration_window
+        beta = guess + self.aspiration_window
+        while True:
+            move = self.alphabeta(game, depth, alpha, beta)
+            value = self.root_value
+            # The value is only a bound when it falls outside the window, so
+            # widen the failing side and search again
+            if value <= alpha and not isinf(alpha):
+                alpha = float("-inf")
+            elif value >= beta and not isinf(beta):
+                beta = float("inf")
+            else:
+                return move
+            if self.stats is not None:
+                self.stats.researches += 1
+
+    def parallel_search(self, game, best_move):
+        """Return the move selected by searching the root moves of the
+        position in the worker processes, or best_move if no worker
+        completed an iteration in time.
+        """
+        import time
+        from concurrent.futures import wait
+
+        moves = self.legal_moves(game)
+        if len(moves) < 2:
+            return best_move
+        deadline = timeout = None
+        if self.use_clock:
+            # The workers stop one TIMER_THRESHOLD before this player must,
+            # which leaves them time to report back
+            timeout = max(0., (self.time_left() - self.TIMER_THRESHOLD) / 1000)
+            deadline = time.monotonic() + timeout
+        root = game.with_players(ROOT_PLAYER, ROOT_OPPONENT)
+        options = self.worker_options()
+        executor = self.executor()
+        futures = [executor.submit(search_root_moves, root,
+                                   moves[i::self.workers], deadline, options)
+                   for i in range(min(self.workers, len(moves)))]
+        done = wait(futures, timeout=timeout).done
+        for future in futures:
+            future.cancel()
+
+        results = []
+        for future in done:
+            iterations, nodes = future.result()
+            self.nodes += nodes
+            if iterations:
+                results.append(iterations)
+        if not results:
+            return best_move
+        # Values of different depths are not comparable, so compare every
+        # worker at the deepest iteration all of them completed, unless one
+        # of them found a forced win
+        depth = min(iterations[-1][0] for iterations in results)
+        if self.stats is not None:
+            self.stats.max_depth = depth
+        candidates = [iterations[-1] if iterations[-1][1] == float("inf")
+                      else iterations[depth - 1] for iterations in results]
+        return max(candidates, key=lambda c: c[1])[2]
+
+    def worker_options(self):
+        """Return the constructor arguments of the players run by the worker
+        processes of a parallel search.
+        """
+        return dict(search_depth=self.search_depth, score_fn=self.score,
+                    timeout=self.TIMER_THRESHOLD, node_limit=self.node_limit,
+                    depth_limit=self.depth_limit, use_clock=self.use_clock,
+                    max_check_interval=self.max_check_interval,
+                    tt_size_mb=self.tt_size_mb, move_orderer=self.orderer,
+                    endgame_solver=self.endgame,
+                    tt_symmetry_plies=self.tt_symmetry_plies, pvs=self.pvs)
+
+    def executor(self):
+        """Return the process pool of the parallel search, starting it on
+        first use.
+        """
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def close(self):
+        """Shut down the worker processes of the parallel search, if any. """
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def prepare_tt(self, game):
+        """Clear the transposition table before a new search, unless it is
+        persisted and still holds results for this game. Stored values are
+        from the point of view of this player, so the table is also cleared
+        whenever the game looks like a new one (the move count went back or
+        this player changed seat).
+        """
+        if self.tt is None:
+            return
+        last = self._tt_move_count
+        if (not self.persist_tt or last is None or game.move_count <= last or
+                (game.move_count - last) % 2):
+            self.tt.clear()
+        else:
+            self.tt.new_search()
+        self._tt_move_count = game.move_count
+
+    def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf"),
+                  root_moves=None):
         """Implement depth-limited minimax search with alpha-beta pruning as
         described in the lectures.
 
@@ -422,11 +1027,16 @@ class AlphaBetaPlayer(IsolationPlayer):
         beta : float
             Beta limits the upper bound of search on maximizing layers
 
+        root_moves : list<(int, int)> (optional)
+            Search only these legal moves of the root instead of all of
+            them (used by the workers of a parallel search).
+
         Returns
         -------
         (int, int)
             The board coordinates of the best move found in the current search;
-            (-1, -1) if there are no legal moves
+            (-1, -1) if there are no legal moves. The value of the move is
+            stored in `root_value`.
 
         Notes
         -----
@@ -439,18 +1049,82 @@ class AlphaBetaPlayer(IsolationPlayer):
                 each helper function or else your agent will timeout during
                 testing.
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self.check_budget()
         v = float("-inf")
         a = set_best_move(game)
-        for m in game.get_legal_moves():
-            contender = self.ab_value(game.forecast_move(m),alpha,beta, depth-1, False)
+        alpha_orig = alpha
+        self._root_depth = depth
+        if root_moves is None:
+            root_moves = self.legal_moves(game)
+        slot = entry = None
+        if self.tt is not None:
+            slot, entry = self.tt_probe(game)
+        moves = self.order_moves(game, root_moves, 0, entry)[1]
+        pvs = self.pvs
+        for i, m in enumerate(moves):
+            game.push_move(m)
+            try:
+                if pvs and i:
+                    contender = self.scout_value(game, alpha, beta, depth-1,
+                                                 False)
+                else:
+                    contender = self.ab_value(game,alpha,beta, depth-1, False)
+            finally:
+                game.pop_move()
             alpha = max(alpha,contender)
             if contender > v:
                 v = contender
                 a = m
+            if v >= beta:
+                break
+        if moves:
+            flag = tt_flag(v, alpha_orig, beta)
+            if self.tt is not None:
+                self.tt_store(game, slot, depth, v, flag, a)
+            if self.orderer is not None and flag == EXACT:
+                self.orderer.record_best(game.zobrist_key, a)
+        self.root_value = v
         return a
 
+    def tt_probe(self, game):
+        """Returns the (slot, entry) pair of the transposition table key of
+        the position with the symmetry it was taken under (see
+        tt_symmetry_plies), and the stored entry for the position with its
+        move mapped back to the position, or None.
+        """
+        if game.move_count < self.tt_symmetry_plies:
+            from isolation.symmetry import canonical_key
+            key, sym = canonical_key(game)
+        else:
+            key, sym = game.zobrist_key, 0
+        entry = self.tt.probe(key)
+        if sym and entry is not None and entry[4] is not None:
+            from isolation.symmetry import from_canonical
+            entry = entry[:4] + (from_canonical(game, entry[4], sym),) + entry[5:]
+        return (key, sym), entry
+
+    def tt_store(self, game, slot, depth, value, flag, move):
+        """Stores a search result of the position under the slot returned
+        by tt_probe().
+        """
+        key, sym = slot
+        if sym:
+            from isolation.symmetry import to_canonical
+            move = to_canonical(game, move, sym)
+        self.tt.store(key, depth, value, flag, move)
+
+    def order_moves(self, game, moves, ply, entry=None):
+        """Returns the (key, moves) pair of the Zobrist key of the position
+        and its legal moves in the order they should be searched, using the
+        transposition table entry for the position (if any) and the move
+        orderer.
+        """
+        key = game.zobrist_key
+        hash_move = entry[4] if entry is not None else None
+        if self.orderer is not None:
+            return key, self.orderer.order(moves, key, ply, hash_move)
+        return key, tt_first(moves, hash_move)
+
     def ab_value(self, game,alpha, beta, depth, is_max):
         """Helper recursion function for Alpha Beta pruning. Determined this
         largely from the pseudocode. I found that once I had figured out minimax
@@ -460,28 +1134,145 @@ class AlphaBetaPlayer(IsolationPlayer):
         changes in a single location for both.
 
         """
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
-        if (depth == 0) | terminal_test(game):
-            return self.score(game, self)
+        self.check_budget()
+        if self.is_leaf(game, depth):
+            return self.evaluate(game)
+        # Reuse a cached result if it was searched at least as deep and is
+        # conclusive for this window; otherwise try its best move first
+        slot = entry = None
+        if self.tt is not None:
+            slot, entry = self.tt_probe(game)
+            if entry is not None and entry[1] >= depth:
+                value, flag = entry[2], entry[3]
+                if (flag == EXACT or (flag == LOWER and value >= beta) or
+                        (flag == UPPER and value <= alpha)):
+                    return value
+        # Once the players are separated the node can be solved exactly
+        if self.endgame is not None and depth >= self.endgame.min_depth:
+            value = self.endgame.value(game, self.check_endgame)
+            if value is not None:
+                return value if is_max else -value
+        ply = self._root_depth - depth
+        key, moves = self.order_moves(game, self.legal_moves(game), ply, entry)
+        alpha_orig, beta_orig = alpha, beta
         # This sets up v properly depending on if this is a max or min calc
         if is_max:
             v = float("-inf")
         else:
             v = float("inf")
-        for m in game.get_legal_moves():
+        best = None
+        pvs = self.pvs
+        for m in moves:
             # Determines if we should recur into a MIN or MAX mode next, and
             # sets the alpha or beta values as necessary for it
+            game.push_move(m)
+            try:
+                if pvs and best is not None:
+                    contender = self.scout_value(game, alpha, beta, depth-1,
+                                                 not is_max)
+                else:
+                    contender = self.ab_value(game,alpha,beta,depth-1,not is_max)
+            finally:
+                game.pop_move()
             if is_max:
-                v = max(v, self.ab_value(game.forecast_move(m),alpha,beta,depth-1,False))
-                if v >= beta: return v
+                if best is None or contender > v:
+                    v, best = contender, m
+                if v >= beta: break
                 alpha = max(alpha, v)
             else:
-                v = min(v, self.ab_value(game.forecast_move(m),alpha,beta,depth-1,True))
-                if v <= alpha: return v
+                if best is None or contender < v:
+                    v, best = contender, m
+                if v <= alpha: break
                 beta = min(beta, v)
+        flag = tt_flag(v, alpha_orig, beta_orig)
+        if self.tt is not None:
+            self.tt_store(game, slot, depth, v, flag, best)
+        if self.orderer is not None:
+            if flag == EXACT:
+                self.orderer.record_best(key, best)
+            elif flag == (LOWER if is_max else UPPER):
+                self.orderer.record_cutoff(best, ply, depth)
+        if self.stats is not None and flag == (LOWER if is_max else UPPER):
+            self.stats.cutoffs += 1
         return v
 
+    def scout_value(self, game, alpha, beta, depth, is_max):
+        """Principal variation search of a node that is not the first child
+        of its parent (same arguments as ab_value): first test with a null
+        window whether its value improves on the best value of the parent,
+        and search it again with the (alpha, beta) window only if it does.
+        """
+        if is_max:
+            # The parent minimizes: is the value below beta?
+            scout = nextafter(beta, float("-inf"))
+            if scout <= alpha:
+                return self.ab_value(game, alpha, beta, depth, is_max)
+            value = self.ab_value(game, scout, beta, depth, is_max)
+        else:
+            # The parent maximizes: is the value above alpha?
+            scout = nextafter(alpha, float("inf"))
+            if scout >= beta:
+                return self.ab_value(game, alpha, beta, depth, is_max)
+            value = self.ab_value(game, alpha, scout, depth, is_max)
+        if alpha < value < beta:
+            if self.stats is not None:
+                self.stats.researches += 1
+            value = self.ab_value(game, alpha, beta, depth, is_max)
+        return value
+
+
+def search_root_moves(game, moves, deadline, options):
+    """Search some of the root moves of a position by iterative deepening
+    until the deadline. This is the unit of work run by the worker processes
+    of a parallel `AlphaBetaPlayer`.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The root position, with ROOT_PLAYER to move against ROOT_OPPONENT.
+
+    moves : list<(int, int)>
+        The root moves to search.
+
+    deadline : float
+        The `time.monotonic()` time at which the search must stop, or None
+        if it is bounded by the node or depth limit only.
+
+    options : dict
+        The constructor arguments of the searching `AlphaBetaPlayer`.
+
+    Returns
+    -------
+    (list<(int, float, (int, int))>, int)
+        The (depth, value, best move) result of every completed iteration
+        and the number of nodes visited.
+    """
+    import time
+
+    player = AlphaBetaPlayer(**options)
+    game = game.with_players(player, ROOT_OPPONENT)
+    if deadline is None:
+        player.time_left = lambda: float("inf")
+    else:
+        player.time_left = lambda: 1000 * (deadline - time.monotonic())
+    player.start_stats()
+    if player.orderer is not None:
+        player.orderer.new_search()
+    # No line of play is longer than the number of blank cells, so deeper
+    # iterations cannot change the result
+    horizon = len(game.get_blank_spaces())
+    iterations = []
+    depth = 1
+    try:
+        while ((player.depth_limit is None or depth <= player.depth_limit) and
+               depth <= horizon):
+            move = player.alphabeta(game, depth, root_moves=moves)
+            iterations.append((depth, player.root_value, move))
+            depth += 1
+    except SearchTimeout:
+        pass
+    return iterations, player.nodes
+
 if __name__ == "__main__":
     from isolation import Board
 
@@ -0,0 +1,362 @@
+"""
+This file contains the `BitBoard` class, an alternate implementation of the
+isolation `Board` that stores the blocked cells of the game as the bits of a
+single integer. Move generation is a lookup of a precomputed knight-attack
+mask for the player location combined with the blocked mask, which is much
+cheaper than probing each of the eight knight offsets with `move_is_legal`.
+
+`BitBoard` is a drop-in replacement for `Board`: it keeps the full public
+API, and cells are numbered exactly like `Board` (index = row + col * height)
+so that the string representations match. Legal moves are still returned in
+random order, but the order is drawn from a fixed set of precomputed
+permutations of each cell's knight targets rather than shuffled per call.
+"""
+import random
+
+from .isolation import Board, DIRECTIONS, zobrist_keys
+
+# Number of precomputed move orderings kept for every cell
+NUM_ORDERINGS = 64
+
+# Knight-attack masks, move orderings and index -> (row, col) lookup tables
+# are shared by every BitBoard with the same geometry
+_GEOMETRY_CACHE = {}
+
+
+def _geometry(width, height):
+    """Return the (attack masks, knight targets, move orderings, coordinates,
+    full mask) tables for a board of the given dimensions, building them on
+    first use.
+
+    The knight targets of a cell are the (bit, (row, col)) pairs of every
+    cell a knight can reach from it, in DIRECTIONS order, and its move
+    orderings are NUM_ORDERINGS random permutations of the targets drawn
+    from a generator seeded with the board dimensions.
+    """
+    key = (width, height)
+    tables = _GEOMETRY_CACHE.get(key)
+    if tables is None:
+        rng = random.Random("orderings-{}x{}".format(width, height))
+        coords = tuple((idx % height, idx // height)
+                       for idx in range(width * height))
+        masks = []
+        targets_table = []
+        orderings = []
+        for r, c in coords:
+            targets = [(1 << ((r + dr) + (c + dc) * height), (r + dr, c + dc))
+                       for dr, dc in DIRECTIONS
+                       if 0 <= r + dr < height and 0 <= c + dc < width]
+            masks.append(sum(bit for bit, _ in targets))
+            targets_table.append(tuple(targets))
+            orderings.append(tuple(tuple(rng.sample(targets, len(targets)))
+                                   for _ in range(NUM_ORDERINGS)))
+        full = (1 << (width * height)) - 1
+        tables = (tuple(masks), tuple(targets_table), tuple(orderings),
+                  coords, full)
+        _GEOMETRY_CACHE[key] = tables
+    return tables
+
+
+class BitBoard(Board):
+    """Implement a model for the game Isolation using an integer bitmask of
+    blocked cells and the cell index of each player.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+
+    shuffle_moves : bool (optional)
+        Overrides the class-level `default_shuffle_moves` setting for this
+        board.
+
+    seed : hashable (optional)
+        Seed of a random generator owned by this board (and shared with its
+        copies) for picking move orderings. If None, the global `random`
+        module is used.
+    """
+
+    __slots__ = ("_masks", "_targets", "_orderings", "_coords", "_full",
+                 "_blocked")
+
+    def __init__(self, player_1, player_2, width=7, height=7,
+                 shuffle_moves=None, seed=None):
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self._player_1 = player_1
+        self._player_2 = player_2
+        self._active_player = player_1
+        self._inactive_player = player_2
+
+        (self._masks, self._targets, self._orderings, self._coords,
+         self._full) = _geometry(width, height)
+        self._blocked = 0
+        # Cell index of each player (NOT_MOVED until placed)
+        self._p1_loc = Board.NOT_MOVED
+        self._p2_loc = Board.NOT_MOVED
+        self._zobrist_keys = zobrist_keys(width, height)
+        self._zobrist = 0
+
+        # Stack of (cell index, previous location) entries for pop_move()
+        self._undo = []
+
+        if shuffle_moves is None:
+            shuffle_moves = self.default_shuffle_moves
+        self._shuffle_moves = shuffle_moves
+        self._rng = random if seed is None else random.Random(seed)
+
+    _SHARED_TABLES = ("_masks", "_targets", "_orderings", "_coords", "_full",
+                      "_zobrist_keys")
+
+    def _load_tables(self):
+        (self._masks, self._targets, self._orderings, self._coords,
+         self._full) = _geometry(self.width, self.height)
+        self._zobrist_keys = zobrist_keys(self.width, self.height)
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        new_board = BitBoard.__new__(BitBoard)
+        new_board.width = self.width
+        new_board.height = self.height
+        new_board.move_count = self.move_count
+        new_board._player_1 = self._player_1
+        new_board._player_2 = self._player_2
+        new_board._active_player = self._active_player
+        new_board._inactive_player = self._inactive_player
+        new_board._masks = self._masks
+        new_board._targets = self._targets
+        new_board._orderings = self._orderings
+        new_board._coords = self._coords
+        new_board._full = self._full
+        new_board._blocked = self._blocked
+        new_board._p1_loc = self._p1_loc
+        new_board._p2_loc = self._p2_loc
+        new_board._zobrist_keys = self._zobrist_keys
+        new_board._zobrist = self._zobrist
+        new_board._undo = self._undo[:]
+        new_board._shuffle_moves = self._shuffle_moves
+        new_board._rng = self._rng
+        return new_board
+
+    def transformed(self, perm):
+        """Return a copy of the board with the contents of every cell index
+        idx moved to cell index perm[idx] (see `isolation.symmetry` for the
+        permutations of the rotations and reflections of the board). The
+        copy starts without pushed moves to undo.
+        """
+        new_board = self.copy()
+        blocked, remaining = 0, self._blocked
+        while remaining:
+            low = remaining & -remaining
+            blocked |= 1 << perm[low.bit_length() - 1]
+            remaining ^= low
+        new_board._blocked = blocked
+        new_board._move_players(perm)
+        return new_board
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
+                not self._blocked >> (move[0] + move[1] * self.height) & 1)
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        return self._cells(self._full & ~self._blocked)
+
+    def blank_mask(self):
+        """Return the blank cells of the board as the bits of an integer,
+        where bit row + col * height is set if the cell (row, col) is blank.
+        """
+        return self._full & ~self._blocked
+
+    def get_player_location(self, player):
+        """Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        (int, int) or None
+            The coordinate pair (row, column) of the input player, or None
+            if the player has not moved.
+        """
+        if player == self._player_1:
+            idx = self._p1_loc
+        elif player == self._player_2:
+            idx = self._p2_loc
+        else:
+            raise RuntimeError(
+                "Invalid player in get_player_location: {}".format(player))
+        if idx == Board.NOT_MOVED:
+            return Board.NOT_MOVED
+        return self._coords[idx]
+
+    def get_legal_moves(self, player=None):
+        """Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        Returns
+        -------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None:
+            player = self._active_player
+        if player == self._player_1:
+            idx = self._p1_loc
+        elif player == self._player_2:
+            idx = self._p2_loc
+        else:
+            raise RuntimeError(
+                "Invalid player in get_legal_moves: {}".format(player))
+        if idx == Board.NOT_MOVED:
+            return self.get_blank_spaces()
+        blocked = self._blocked
+        if self._shuffle_moves:
+            ordering = self._orderings[idx][int(self._rng.random() * NUM_ORDERINGS)]
+        else:
+            ordering = self._targets[idx]
+        return [cell for bit, cell in ordering if not blocked & bit]
+
+    def has_legal_move(self, player=None):
+        """Test whether the specified player has at least one legal move,
+        with a single mask test.
+        """
+        return bool(self._open_targets(player, "has_legal_move"))
+
+    def count_legal_moves(self, player=None):
+        """Return the number of legal moves of the specified player, counted
+        from the bits of its open knight targets.
+        """
+        return bin(self._open_targets(player, "count_legal_moves")).count("1")
+
+    def _open_targets(self, player, caller):
+        # Returns the mask of the cells the player can move to (every blank
+        # cell if it is not on the board yet)
+        if player is None:
+            player = self._active_player
+        if player == self._player_1:
+            idx = self._p1_loc
+        elif player == self._player_2:
+            idx = self._p2_loc
+        else:
+            raise RuntimeError(
+                "Invalid player in {}: {}".format(caller, player))
+        if idx == Board.NOT_MOVED:
+            return self._full & ~self._blocked
+        return self._masks[idx] & ~self._blocked
+
+    def apply_move(self, move):
+        """Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        idx = move[0] + move[1] * self.height
+        cell_keys, location_keys, side_key = self._zobrist_keys
+        if self._active_player == self._player_2:
+            last_loc, self._p2_loc = self._p2_loc, idx
+            player_keys = location_keys[1]
+        else:
+            last_loc, self._p1_loc = self._p1_loc, idx
+            player_keys = location_keys[0]
+        if last_loc != Board.NOT_MOVED:
+            self._zobrist ^= player_keys[last_loc]
+        self._zobrist ^= cell_keys[idx] ^ player_keys[idx] ^ side_key
+        self._blocked |= 1 << idx
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count += 1
+
+    def pop_move(self):
+        """Undo the last move applied with push_move(), restoring the board to
+        the state it had before that move.
+        """
+        if not self._undo:
+            raise RuntimeError("There are no pushed moves to undo.")
+        idx, last_loc = self._undo.pop()
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        cell_keys, location_keys, side_key = self._zobrist_keys
+        if self._active_player == self._player_2:
+            self._p2_loc = last_loc
+            player_keys = location_keys[1]
+        else:
+            self._p1_loc = last_loc
+            player_keys = location_keys[0]
+        if last_loc != Board.NOT_MOVED:
+            self._zobrist ^= player_keys[last_loc]
+        self._zobrist ^= cell_keys[idx] ^ player_keys[idx] ^ side_key
+        self._blocked &= ~(1 << idx)
+        self.move_count -= 1
+
+    def to_string(self, symbols=['1', '2']):
+        """Generate a string representation of the current game state, marking
+        the location of each player and indicating which cells have been
+        blocked, and which remain open.
+        """
+        col_margin = len(str(self.height - 1)) + 1
+        prefix = "{:<" + "{}".format(col_margin) + "}"
+        offset = " " * (col_margin + 3)
+        out = offset + '   '.join(map(str, range(self.width))) + '\n\r'
+        for i in range(self.height):
+            out += prefix.format(i) + ' | '
+            for j in range(self.width):
+                idx = i + j * self.height
+                if not self._blocked >> idx & 1:
+                    out += ' '
+                elif self._p1_loc == idx:
+                    out += symbols[0]
+                elif self._p2_loc == idx:
+                    out += symbols[1]
+                else:
+                    out += '-'
+                out += ' | '
+            out += '\n\r'
+
+        return out
+
+    def _cells(self, mask):
+        """Return the (row, column) coordinates of every set bit in mask. """
+        coords = self._coords
+        cells = []
+        while mask:
+            low = mask & -mask
+            cells.append(coords[low.bit_length() - 1])
+            mask ^= low
+        return cells
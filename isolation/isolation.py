@@ -9,10 +9,87 @@ be available to project reviewers.
 """
 import random
 import timeit
-from copy import copy
 
 TIME_LIMIT_MILLIS = 150
 
+DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2), (1, 2), (2, -1), (2, 1)]
+
+# Knight-move neighbor tables shared by every Board with the same geometry
+_NEIGHBOR_CACHE = {}
+
+# Translation table from the cell values of Board._board_state to the binary
+# digits of blank_mask()
+_BLANK_DIGITS = b"1" + b"0" * 255
+
+
+def knight_neighbors(width, height):
+    """Return the knight-move neighbor table for a board of the given
+    dimensions, building it on first use.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns of the board.
+
+    height : int
+        The number of rows of the board.
+
+    Returns
+    -------
+    tuple<tuple<(int, (int, int))>>
+        For every cell index (row + column * height), a tuple of the
+        (index, (row, column)) pairs of the cells a knight can reach from it.
+    """
+    table = _NEIGHBOR_CACHE.get((width, height))
+    if table is None:
+        table = tuple(
+            tuple(((r + dr) + (c + dc) * height, (r + dr, c + dc))
+                  for dr, dc in DIRECTIONS
+                  if 0 <= r + dr < height and 0 <= c + dc < width)
+            for c, r in ((idx // height, idx % height)
+                         for idx in range(width * height)))
+        _NEIGHBOR_CACHE[(width, height)] = table
+    return table
+
+
+# Zobrist key tables shared by every Board with the same geometry
+_ZOBRIST_CACHE = {}
+
+
+def zobrist_keys(width, height):
+    """Return the Zobrist hashing keys for a board of the given dimensions,
+    building them on first use.
+
+    The keys are drawn from a random generator seeded with the board
+    dimensions, so the hash of a position is the same in every process and
+    across runs.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns of the board.
+
+    height : int
+        The number of rows of the board.
+
+    Returns
+    -------
+    (tuple<int>, (tuple<int>, tuple<int>), int)
+        The 64-bit keys for each blocked cell, for the location of player 1
+        and player 2 on each cell, and for player 2 holding the initiative.
+    """
+    keys = _ZOBRIST_CACHE.get((width, height))
+    if keys is None:
+        rng = random.Random("zobrist-{}x{}".format(width, height))
+        size = width * height
+        cell_keys = tuple(rng.getrandbits(64) for _ in range(size))
+        location_keys = (tuple(rng.getrandbits(64) for _ in range(size)),
+                         tuple(rng.getrandbits(64) for _ in range(size)))
+        keys = (cell_keys, location_keys, rng.getrandbits(64))
+        _ZOBRIST_CACHE[(width, height)] = keys
+    return keys
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
@@ -33,11 +110,35 @@ class Board(object):
 
     height : int (optional)
         The number of rows that the board should have.
+
+    shuffle_moves : bool (optional)
+        Overrides the class-level `default_shuffle_moves` setting for this
+        board. If
+        False, legal moves are always returned in the same canonical order.
+
+    seed : hashable (optional)
+        Seed of a random generator owned by this board (and shared with its
+        copies) for shuffling moves, making move order reproducible. If None,
+        the global `random` module is used.
     """
     BLANK = 0
     NOT_MOVED = None
 
-    def __init__(self, player_1, player_2, width=7, height=7):
+    # Boards are slotted (no per-instance __dict__) to keep the many boards
+    # alive during a search or a tournament small and cheap to copy
+    __slots__ = ("width", "height", "move_count", "_player_1", "_player_2",
+                 "_active_player", "_inactive_player", "_board_state",
+                 "_p1_loc", "_p2_loc", "_neighbors", "_zobrist_keys",
+                 "_zobrist", "_undo", "_shuffle_moves", "_rng")
+
+    # Default of shuffle_moves for new boards: whether get_legal_moves()
+    # returns the moves of a placed player in random order. Searches that
+    # order moves themselves can turn this off (on the class or on one
+    # board) to skip the shuffle.
+    default_shuffle_moves = True
+
+    def __init__(self, player_1, player_2, width=7, height=7,
+                 shuffle_moves=None, seed=None):
         self.width = width
         self.height = height
         self.move_count = 0
@@ -46,14 +147,73 @@ class Board(object):
         self._active_player = player_1
         self._inactive_player = player_2
 
-        # The last 3 entries of the board state includes initiative (0 for
-        # player 1, 1 for player 2) player 2 last move, and player 1 last move
-        self._board_state = [Board.BLANK] * (width * height + 3)
-        self._board_state[-1] = Board.NOT_MOVED
-        self._board_state[-2] = Board.NOT_MOVED
+        # One byte per cell (BLANK or 1 for a blocked cell), and the cell
+        # index of each player (NOT_MOVED until placed)
+        self._board_state = bytearray(width * height)
+        self._p1_loc = Board.NOT_MOVED
+        self._p2_loc = Board.NOT_MOVED
+        self._neighbors = knight_neighbors(width, height)
+        self._zobrist_keys = zobrist_keys(width, height)
+        self._zobrist = 0
+
+        # Stack of (cell index, previous location) entries for pop_move()
+        self._undo = []
+
+        if shuffle_moves is None:
+            shuffle_moves = self.default_shuffle_moves
+        self._shuffle_moves = shuffle_moves
+        self._rng = random if seed is None else random.Random(seed)
+
+    @property
+    def shuffle_moves(self):
+        """Whether get_legal_moves() returns the moves of a placed player in
+        random order on this board (see `default_shuffle_moves`).
+        """
+        return self._shuffle_moves
+
+    @shuffle_moves.setter
+    def shuffle_moves(self, value):
+        self._shuffle_moves = value
+
+    # Attributes holding the tables shared by every board of the same
+    # geometry, which are rebuilt from the caches rather than pickled
+    _SHARED_TABLES = ("_neighbors", "_zobrist_keys")
+
+    def _load_tables(self):
+        self._neighbors = knight_neighbors(self.width, self.height)
+        self._zobrist_keys = zobrist_keys(self.width, self.height)
+
+    def _slot_names(self):
+        # Returns the names of the slots of every class of the board
+        return [name for cls in type(self).__mro__
+                for name in cls.__dict__.get("__slots__", ())]
+
+    def __getstate__(self):
+        state = {name: getattr(self, name) for name in self._slot_names()
+                 if name not in self._SHARED_TABLES and hasattr(self, name)}
+        # The global random module cannot be pickled
+        if state.get("_rng") is random:
+            state["_rng"] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        if self._rng is None:
+            self._rng = random
+        self._load_tables()
 
     def hash(self):
-        return str(self._board_state).__hash__()
+        return self._zobrist
+
+    @property
+    def zobrist_key(self):
+        """The 64-bit Zobrist hash of the current game state, including the
+        blocked cells, the location of each player and the player holding
+        initiative. The key is updated incrementally by every move, so
+        reading it is O(1).
+        """
+        return self._zobrist
 
     @property
     def active_player(self):
@@ -92,13 +252,77 @@ class Board(object):
 
     def copy(self):
         """ Return a deep copy of the current board. """
-        new_board = Board(self._player_1, self._player_2, width=self.width, height=self.height)
+        # Bypass __init__: the state is one buffer copy plus the undo stack
+        new_board = Board.__new__(Board)
+        new_board.width = self.width
+        new_board.height = self.height
         new_board.move_count = self.move_count
+        new_board._player_1 = self._player_1
+        new_board._player_2 = self._player_2
         new_board._active_player = self._active_player
         new_board._inactive_player = self._inactive_player
-        new_board._board_state = copy(self._board_state)
+        new_board._board_state = self._board_state[:]
+        new_board._p1_loc = self._p1_loc
+        new_board._p2_loc = self._p2_loc
+        new_board._neighbors = self._neighbors
+        new_board._zobrist_keys = self._zobrist_keys
+        new_board._zobrist = self._zobrist
+        new_board._undo = self._undo[:]
+        new_board._shuffle_moves = self._shuffle_moves
+        new_board._rng = self._rng
+        return new_board
+
+    def with_players(self, active_player, inactive_player):
+        """Return a copy of the board with active_player and inactive_player
+        registered in place of the current active and inactive players (in
+        the same seats). This is useful to send a position to another process
+        without pickling the agents playing it.
+        """
+        new_board = self.copy()
+        if self._active_player == self._player_1:
+            new_board._player_1 = active_player
+            new_board._player_2 = inactive_player
+        else:
+            new_board._player_1 = inactive_player
+            new_board._player_2 = active_player
+        new_board._active_player = active_player
+        new_board._inactive_player = inactive_player
+        return new_board
+
+    def transformed(self, perm):
+        """Return a copy of the board with the contents of every cell index
+        idx moved to cell index perm[idx] (see `isolation.symmetry` for the
+        permutations of the rotations and reflections of the board). The
+        copy starts without pushed moves to undo.
+        """
+        new_board = self.copy()
+        state = bytearray(len(self._board_state))
+        for idx, value in enumerate(self._board_state):
+            state[perm[idx]] = value
+        new_board._board_state = state
+        new_board._move_players(perm)
         return new_board
 
+    def _move_players(self, perm):
+        # Moves the players of a transformed copy to their new cells and
+        # rebuilds the Zobrist key of the copy from scratch
+        if self._p1_loc != Board.NOT_MOVED:
+            self._p1_loc = perm[self._p1_loc]
+        if self._p2_loc != Board.NOT_MOVED:
+            self._p2_loc = perm[self._p2_loc]
+        self._undo = []
+        cell_keys, (p1_keys, p2_keys), side_key = self._zobrist_keys
+        key = side_key if self.move_count % 2 else 0
+        for row, col in self.get_blank_spaces():
+            key ^= cell_keys[row + col * self.height]
+        for cell_key in cell_keys:
+            key ^= cell_key
+        if self._p1_loc != Board.NOT_MOVED:
+            key ^= p1_keys[self._p1_loc]
+        if self._p2_loc != Board.NOT_MOVED:
+            key ^= p2_keys[self._p2_loc]
+        self._zobrist = key
+
     def forecast_move(self, move):
         """Return a deep copy of the current game with an input move applied to
         advance the game one ply.
@@ -142,6 +366,12 @@ class Board(object):
         return [(i, j) for j in range(self.width) for i in range(self.height)
                 if self._board_state[i + j * self.height] == Board.BLANK]
 
+    def blank_mask(self):
+        """Return the blank cells of the board as the bits of an integer,
+        where bit row + col * height is set if the cell (row, col) is blank.
+        """
+        return int(self._board_state.translate(_BLANK_DIGITS)[::-1], 2)
+
     def get_player_location(self, player):
         """Find the current location of the specified player on the board.
 
@@ -157,16 +387,14 @@ class Board(object):
             if the player has not moved.
         """
         if player == self._player_1:
-            if self._board_state[-1] == Board.NOT_MOVED:
-                return Board.NOT_MOVED
-            idx = self._board_state[-1]
+            idx = self._p1_loc
         elif player == self._player_2:
-            if self._board_state[-2] == Board.NOT_MOVED:
-                return Board.NOT_MOVED
-            idx = self._board_state[-2]
+            idx = self._p2_loc
         else:
             raise RuntimeError(
                 "Invalid player in get_player_location: {}".format(player))
+        if idx == Board.NOT_MOVED:
+            return Board.NOT_MOVED
         w = idx // self.height
         h = idx % self.height
         return (h, w)
@@ -187,8 +415,15 @@ class Board(object):
             for the player constrained by the current game state.
         """
         if player is None:
-            player = self.active_player
-        return self.__get_moves(self.get_player_location(player))
+            player = self._active_player
+        if player == self._player_1:
+            idx = self._p1_loc
+        elif player == self._player_2:
+            idx = self._p2_loc
+        else:
+            raise RuntimeError(
+                "Invalid player in get_legal_moves: {}".format(player))
+        return self.__get_moves(idx)
 
     def apply_move(self, move):
         """Move the active player to a specified location.
@@ -200,20 +435,135 @@ class Board(object):
             the active player on the board.
         """
         idx = move[0] + move[1] * self.height
-        last_move_idx = int(self.active_player == self._player_2) + 1
-        self._board_state[-last_move_idx] = idx
+        cell_keys, location_keys, side_key = self._zobrist_keys
+        if self._active_player == self._player_2:
+            last_loc, self._p2_loc = self._p2_loc, idx
+            player_keys = location_keys[1]
+        else:
+            last_loc, self._p1_loc = self._p1_loc, idx
+            player_keys = location_keys[0]
+        if last_loc != Board.NOT_MOVED:
+            self._zobrist ^= player_keys[last_loc]
+        self._zobrist ^= cell_keys[idx] ^ player_keys[idx] ^ side_key
         self._board_state[idx] = 1
-        self._board_state[-3] ^= 1
         self._active_player, self._inactive_player = self._inactive_player, self._active_player
         self.move_count += 1
 
+    def push_move(self, move):
+        """Move the active player to a specified location, recording enough
+        information to restore the current state with pop_move().
+
+        Unlike forecast_move(), the board is modified in-place, so searching
+        a game tree with push_move()/pop_move() pairs does not allocate a new
+        board for every node.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        if self._active_player == self._player_2:
+            self._undo.append((move[0] + move[1] * self.height, self._p2_loc))
+        else:
+            self._undo.append((move[0] + move[1] * self.height, self._p1_loc))
+        self.apply_move(move)
+
+    def pop_move(self):
+        """Undo the last move applied with push_move(), restoring the board to
+        the state it had before that move.
+        """
+        if not self._undo:
+            raise RuntimeError("There are no pushed moves to undo.")
+        idx, last_loc = self._undo.pop()
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        cell_keys, location_keys, side_key = self._zobrist_keys
+        if self._active_player == self._player_2:
+            self._p2_loc = last_loc
+            player_keys = location_keys[1]
+        else:
+            self._p1_loc = last_loc
+            player_keys = location_keys[0]
+        if last_loc != Board.NOT_MOVED:
+            self._zobrist ^= player_keys[last_loc]
+        self._zobrist ^= cell_keys[idx] ^ player_keys[idx] ^ side_key
+        self._board_state[idx] = Board.BLANK
+        self.move_count -= 1
+
+    def has_legal_move(self, player=None):
+        """Test whether the specified player has at least one legal move.
+        Unlike get_legal_moves(), this builds no list and stops at the first
+        legal move found.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            test the active player on the board.
+
+        Returns
+        -------
+        bool
+            True if the player has a legal move, False otherwise.
+        """
+        if player is None:
+            player = self._active_player
+        if player == self._player_1:
+            idx = self._p1_loc
+        elif player == self._player_2:
+            idx = self._p2_loc
+        else:
+            raise RuntimeError(
+                "Invalid player in has_legal_move: {}".format(player))
+        state = self._board_state
+        if idx == Board.NOT_MOVED:
+            return Board.BLANK in state
+        for n, _ in self._neighbors[idx]:
+            if state[n] == Board.BLANK:
+                return True
+        return False
+
+    def count_legal_moves(self, player=None):
+        """Return the number of legal moves of the specified player, which is
+        len(get_legal_moves(player)) without building (and shuffling) the
+        list of moves.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            count the moves of the active player on the board.
+
+        Returns
+        -------
+        int
+            The number of legal moves of the player.
+        """
+        if player is None:
+            player = self._active_player
+        if player == self._player_1:
+            idx = self._p1_loc
+        elif player == self._player_2:
+            idx = self._p2_loc
+        else:
+            raise RuntimeError(
+                "Invalid player in count_legal_moves: {}".format(player))
+        state = self._board_state
+        if idx == Board.NOT_MOVED:
+            return state.count(Board.BLANK)
+        count = 0
+        for n, _ in self._neighbors[idx]:
+            if state[n] == Board.BLANK:
+                count += 1
+        return count
+
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
-        return player == self._inactive_player and not self.get_legal_moves(self._active_player)
+        return player == self._inactive_player and not self.has_legal_move(self._active_player)
 
     def is_loser(self, player):
         """ Test whether the specified player has lost the game. """
-        return player == self._active_player and not self.get_legal_moves(self._active_player)
+        return player == self._active_player and not self.has_legal_move(self._active_player)
 
     def utility(self, player):
         """Returns the utility of the current game state from the perspective
@@ -237,7 +587,7 @@ class Board(object):
             a value of -inf if the player has lost, and a value of 0
             otherwise.
         """
-        if not self.get_legal_moves(self._active_player):
+        if not self.has_legal_move(self._active_player):
 
             if player == self._inactive_player:
                 return float("inf")
@@ -247,19 +597,18 @@ class Board(object):
 
         return 0.
 
-    def __get_moves(self, loc):
+    def __get_moves(self, idx):
         """Generate the list of possible moves for an L-shaped motion (like a
-        knight in chess).
+        knight in chess) from the cell with the given index.
         """
-        if loc == Board.NOT_MOVED:
+        if idx == Board.NOT_MOVED:
             return self.get_blank_spaces()
 
-        r, c = loc
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2), (1, 2), (2, -1), (2, 1)]
-        valid_moves = [(r + dr, c + dc) for dr, dc in directions
-                       if self.move_is_legal((r + dr, c + dc))]
-        random.shuffle(valid_moves)
+        state = self._board_state
+        valid_moves = [move for n, move in self._neighbors[idx]
+                       if state[n] == Board.BLANK]
+        if self._shuffle_moves:
+            self._rng.shuffle(valid_moves)
         return valid_moves
 
     def print_board(self):
@@ -271,8 +620,8 @@ class Board(object):
         the location of each player and indicating which cells have been
         blocked, and which remain open.
         """
-        p1_loc = self._board_state[-1]
-        p2_loc = self._board_state[-2]
+        p1_loc = self._p1_loc
+        p2_loc = self._p2_loc
 
         col_margin = len(str(self.height - 1)) + 1
         prefix = "{:<" + "{}".format(col_margin) + "}"
@@ -295,7 +644,8 @@ class Board(object):
 
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, move_times=None,
+             ponder=False):
         """Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
@@ -305,6 +655,20 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        move_times : list (optional)
+            If given, the number of milliseconds each player took to select
+            each move is appended to this list, in turn order.
+
+        ponder : bool (optional)
+            If True, players may think on the opponent's time. Players may
+            optionally implement start_pondering(game) and stop_pondering():
+            the waiting player's start_pondering() is called with a copy of
+            the game before the active player is asked for its move, and
+            stop_pondering() right after the move is returned. Off by
+            default, because a pondering thread competes for the interpreter
+            with an opponent running in the same process and slows down the
+            opponent's clock.
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -321,10 +685,22 @@ class Board(object):
             legal_player_moves = self.get_legal_moves()
             game_copy = self.copy()
 
+            # Let the waiting player think on the active player's time
+            waiting_player = self._inactive_player
+            ponders = ponder and hasattr(waiting_player, "start_pondering")
+            if ponders:
+                waiting_player.start_pondering(self.copy())
+
             move_start = time_millis()
             time_left = lambda : time_limit - (time_millis() - move_start)
             curr_move = self._active_player.get_move(game_copy, time_left)
-            move_end = time_left()
+            move_elapsed = time_millis() - move_start
+            move_end = time_limit - move_elapsed
+
+            if ponders:
+                waiting_player.stop_pondering()
+            if move_times is not None:
+                move_times.append(move_elapsed)
 
             if curr_move is None:
                 curr_move = Board.NOT_MOVED
@@ -0,0 +1,139 @@
+"""
+This file maps isolation positions to a canonical orientation under the
+symmetries of the board: the 8 rotations and reflections of a square board,
+or the 4 (identity, row flip, column flip and half turn) of a rectangular
+one. Knight moves are preserved by all of them, so symmetric positions have
+the same game value and caches keyed by `canonical_key` can share one entry
+between them.
+
+Symmetries are numbered by their index in `symmetries(width, height)`; 0 is
+always the identity. A move found in the canonical orientation of a position
+is mapped back to the position's own orientation with `from_canonical`, and
+a move of the position is mapped into the canonical orientation with
+`to_canonical`:
+
+    key, sym = canonical_key(game)
+    book[key] = to_canonical(game, move, sym)
+    ...
+    move = from_canonical(game, book[key], sym)
+"""
+from .isolation import Board, zobrist_keys
+
+# Cell permutations of every symmetry of a board geometry
+_SYMMETRY_CACHE = {}
+
+
+def symmetries(width, height):
+    """Return the symmetries of a board of the given dimensions, building
+    them on first use.
+
+    Returns
+    -------
+    tuple<(tuple<int>, tuple<int>)>
+        A (permutation, inverse) pair of cell index tuples for every
+        symmetry, the identity first: the symmetry moves the content of cell
+        idx to cell permutation[idx].
+    """
+    key = (width, height)
+    perms = _SYMMETRY_CACHE.get(key)
+    if perms is None:
+        w, h = width - 1, height - 1
+        maps = [lambda r, c: (r, c),
+                lambda r, c: (h - r, c),
+                lambda r, c: (r, w - c),
+                lambda r, c: (h - r, w - c)]
+        if width == height:
+            maps += [lambda r, c: (c, r),
+                     lambda r, c: (c, h - r),
+                     lambda r, c: (w - c, r),
+                     lambda r, c: (w - c, h - r)]
+        perms = []
+        for fn in maps:
+            perm = [0] * (width * height)
+            for c in range(width):
+                for r in range(height):
+                    r2, c2 = fn(r, c)
+                    perm[r + c * height] = r2 + c2 * height
+            inverse = [0] * len(perm)
+            for idx, target in enumerate(perm):
+                inverse[target] = idx
+            perms.append((tuple(perm), tuple(inverse)))
+        perms = tuple(perms)
+        _SYMMETRY_CACHE[key] = perms
+    return perms
+
+
+def canonical_key(game):
+    """Return the canonical key of the position: the smallest Zobrist key of
+    its symmetric variants, which is the same for every variant.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The position (a `Board` or a `BitBoard`).
+
+    Returns
+    -------
+    (int, int)
+        The canonical key and the index of the symmetry that maps the
+        position to its canonical orientation (the Zobrist key of the
+        position itself is the key of symmetry 0).
+    """
+    width, height = game.width, game.height
+    cell_keys, (p1_keys, p2_keys), side_key = zobrist_keys(width, height)
+    blank = set(r + c * height for r, c in game.get_blank_spaces())
+    blocked = [idx for idx in range(width * height) if idx not in blank]
+    # Player 1 holds the initiative after an even number of moves
+    if game.move_count % 2 == 0:
+        p1, p2 = game.active_player, game.inactive_player
+    else:
+        p1, p2 = game.inactive_player, game.active_player
+    locations = []
+    for keys, player in ((p1_keys, p1), (p2_keys, p2)):
+        loc = game.get_player_location(player)
+        if loc is not Board.NOT_MOVED:
+            locations.append((keys, loc[0] + loc[1] * height))
+    start = side_key if game.move_count % 2 else 0
+    best = None
+    for sym, (perm, _) in enumerate(symmetries(width, height)):
+        key = start
+        for idx in blocked:
+            key ^= cell_keys[perm[idx]]
+        for keys, idx in locations:
+            key ^= keys[perm[idx]]
+        if best is None or key < best[0]:
+            best = (key, sym)
+    return best
+
+
+def canonical_board(game):
+    """Return a copy of the position in its canonical orientation (without
+    pushed moves to undo) and the index of the symmetry that produced it.
+    """
+    sym = canonical_key(game)[1]
+    perm = symmetries(game.width, game.height)[sym][0]
+    return game.transformed(perm), sym
+
+
+def _map_move(game, move, table):
+    # Maps a (row, col) move through a cell permutation; None and (-1, -1)
+    # are returned unchanged
+    if move is None or move == (-1, -1):
+        return move
+    height = game.height
+    idx = table[move[0] + move[1] * height]
+    return (idx % height, idx // height)
+
+
+def to_canonical(game, move, sym):
+    """Map a move of the position to the canonical orientation produced by
+    the symmetry sym (as returned by `canonical_key`).
+    """
+    return _map_move(game, move, symmetries(game.width, game.height)[sym][0])
+
+
+def from_canonical(game, move, sym):
+    """Map a move of the canonical orientation produced by the symmetry sym
+    (as returned by `canonical_key`) back to the position.
+    """
+    return _map_move(game, move, symmetries(game.width, game.height)[sym][1])
@@ -0,0 +1,96 @@
+"""This file contains the move ordering heuristics used by `AlphaBetaPlayer`
+to search the moves most likely to cause a cutoff first.
+
+Moves are tried in the following order:
+
+    1. the hash move -- the best move stored for the position in the
+       transposition table or found by the previous iterative deepening
+       iteration (the principal variation move)
+    2. killer moves -- moves that caused a cutoff at the same ply in a
+       sibling subtree
+    3. all remaining moves by decreasing history score, which accumulates
+       depth * depth every time the move causes a cutoff for the same side
+"""
+
+# Number of killer moves remembered for each ply
+NUM_KILLERS = 2
+
+
+class MoveOrderer:
+    """Principal variation, killer move and history heuristic move ordering.
+
+    Any object with the same `new_search`, `order`, `record_best` and
+    `record_cutoff` methods can be passed to `AlphaBetaPlayer` instead.
+    """
+
+    def __init__(self):
+        self.pv = {}
+        self.killers = {}
+        self.history = {}
+
+    def new_search(self):
+        """Reset the ordering state before searching a new root position.
+        Killer and principal variation moves are forgotten, and history
+        scores are halved so that recent cutoffs weigh more.
+        """
+        self.pv = {}
+        self.killers = {}
+        self.history = {key: score // 2 for key, score in self.history.items()
+                        if score > 1}
+
+    def order(self, moves, key, ply, hash_move=None):
+        """Return the list of moves sorted in the order they should be
+        searched.
+
+        Parameters
+        ----------
+        moves : list<(int, int)>
+            The legal moves in the current position.
+
+        key : int
+            The Zobrist key of the current position.
+
+        ply : int
+            The distance in plies from the root of the search.
+
+        hash_move : (int, int) (optional)
+            The best move stored in the transposition table, if any.
+
+        Returns
+        -------
+        list<(int, int)>
+            The same moves, best candidates first.
+        """
+        if len(moves) < 2:
+            return moves
+        history = self.history
+        side = ply % 2
+        ordered = sorted(moves, key=lambda m: history.get((side, m), 0),
+                         reverse=True)
+        for killer in reversed(self.killers.get(ply, ())):
+            if killer in ordered:
+                ordered.remove(killer)
+                ordered.insert(0, killer)
+        if hash_move is None:
+            hash_move = self.pv.get(key)
+        if hash_move is not None and hash_move in ordered:
+            ordered.remove(hash_move)
+            ordered.insert(0, hash_move)
+        return ordered
+
+    def record_best(self, key, move):
+        """Remember the best move of a position whose value was searched
+        exactly, so it is searched first by the next iteration.
+        """
+        self.pv[key] = move
+
+    def record_cutoff(self, move, ply, depth):
+        """Update the killer moves and history scores after a move caused a
+        beta (or alpha) cutoff with the given remaining depth.
+        """
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[NUM_KILLERS:]
+        side_move = (ply % 2, move)
+        self.history[side_move] = self.history.get(side_move, 0) + depth * depth
@@ -0,0 +1,178 @@
+"""Build and read opening books: the move chosen by a deep search for every
+position of the first few plies of the game, stored in a compact binary file
+that agents consult before searching (see the `opening_book` option of the
+players in `game_agent`).
+
+Positions are reduced by the symmetries of the board (see
+`isolation.symmetry`): every position is stored once, under its canonical
+key, with the book move in the canonical orientation.
+
+The file is a 16 byte header (magic, board width and height, number of
+entries) followed by one 10 byte entry per position: the little-endian
+uint64 canonical key and the uint16 cell index of the move, sorted by key.
+`OpeningBook` memory-maps the file on first use and finds entries by binary
+search, so loading a book costs nothing until it is consulted.
+
+Example:
+
+    python opening_book.py book.bin --plies 3 --depth 5
+"""
+import argparse
+import mmap
+import struct
+
+from isolation import Board
+from isolation.symmetry import canonical_key, from_canonical, to_canonical
+from game_agent import AlphaBetaPlayer, custom_score
+from move_ordering import MoveOrderer
+
+MAGIC = b"ISOBOOK\x01"
+HEADER = struct.Struct("<8sBBxxI")
+ENTRY = struct.Struct("<QH")
+KEY = struct.Struct("<Q")
+
+
+class OpeningBook:
+    """Lazily memory-mapped reader of an opening book file.
+
+    Parameters
+    ----------
+    path : str
+        The path of a file written by `build_book`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+        self.width = self.height = None
+        self._count = 0
+
+    def __getstate__(self):
+        # Memory maps cannot be pickled; the copy reopens the file on use
+        state = self.__dict__.copy()
+        state["_map"] = None
+        return state
+
+    def __len__(self):
+        self._open()
+        return self._count
+
+    def _open(self):
+        if self._map is not None:
+            return
+        with open(self.path, "rb") as f:
+            book_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, width, height, count = HEADER.unpack_from(book_map, 0)
+        if magic != MAGIC:
+            raise ValueError("{} is not an opening book.".format(self.path))
+        self.width, self.height, self._count = width, height, count
+        self._map = book_map
+
+    def _find(self, key):
+        # Returns the move cell index stored for the key, or None
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = KEY.unpack_from(self._map, HEADER.size + mid * ENTRY.size)[0]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return ENTRY.unpack_from(
+                    self._map, HEADER.size + mid * ENTRY.size)[1]
+        return None
+
+    def lookup(self, game):
+        """Return the book move of the position, or None if the position is
+        not in the book.
+        """
+        self._open()
+        if (game.width, game.height) != (self.width, self.height):
+            return None
+        key, sym = canonical_key(game)
+        idx = self._find(key)
+        if idx is None:
+            return None
+        move = (idx % game.height, idx // game.height)
+        return from_canonical(game, move, sym)
+
+
+def search_move(player, game, depth):
+    """Return the best move of the active player found by iterative
+    deepening alpha-beta search to the given depth.
+    """
+    game = game.with_players(player, "opponent")
+    player.time_left = lambda: float("inf")
+    player.start_stats()
+    player.prepare_tt(game)
+    player.orderer.new_search()
+    move = None
+    for d in range(1, depth + 1):
+        move = player.alphabeta(game, d)
+    return move
+
+
+def build_book(path, plies=3, depth=5, width=7, height=7,
+               score_fn=custom_score, verbose=False):
+    """Search every position of the first plies of the game (up to
+    symmetry) to the given depth and write the book moves to path.
+
+    Returns
+    -------
+    int
+        The number of positions in the book.
+    """
+    player = AlphaBetaPlayer(score_fn=score_fn, depth_limit=depth,
+                             use_clock=False, tt_size_mb=16,
+                             move_orderer=MoveOrderer())
+    entries = {}
+    frontier = [Board("Player1", "Player2", width, height,
+                      shuffle_moves=False)]
+    for ply in range(plies):
+        children = {}
+        for game in frontier:
+            key, sym = canonical_key(game)
+            if key in entries:
+                continue
+            move = search_move(player, game, depth)
+            if move == (-1, -1):
+                continue
+            move = to_canonical(game, move, sym)
+            entries[key] = move[0] + move[1] * height
+            if ply + 1 < plies:
+                for child_move in game.get_legal_moves():
+                    child = game.forecast_move(child_move)
+                    children.setdefault(canonical_key(child)[0], child)
+        if verbose:
+            print("ply {}: {} positions in the book".format(ply, len(entries)),
+                  flush=True)
+        frontier = list(children.values())
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, width, height, len(entries)))
+        for key in sorted(entries):
+            f.write(ENTRY.pack(key, entries[key]))
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build an opening book by searching the first plies.")
+    parser.add_argument("output", help="book file to write")
+    parser.add_argument("--plies", type=int, default=3,
+                        help="number of plies covered by the book (default: 3)")
+    parser.add_argument("--depth", type=int, default=5,
+                        help="search depth of every book move (default: 5)")
+    parser.add_argument("--width", type=int, default=7,
+                        help="board width (default: 7)")
+    parser.add_argument("--height", type=int, default=7,
+                        help="board height (default: 7)")
+    args = parser.parse_args()
+    count = build_book(args.output, args.plies, args.depth, args.width,
+                       args.height, verbose=True)
+    print("Wrote {} positions to {}".format(count, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""Play a large number of games between the tournament agents and stream the
+result of every game to an append-only JSONL or CSV file as it completes.
+
+Every pairing of a cpu agent and a test agent plays the requested number of
+games. Games come in pairs that share a random opening (a move and a
+response) with the test agent playing first in one game and second in the
+other, like the "fair" matches of `tournament.py`. Openings are derived from
+the seed and the match number, so the schedule is reproducible and an
+interrupted run can be resumed by running the same command again: games
+already recorded in the output file are skipped.
+
+Win rates and 95% confidence intervals are computed incrementally from
+running counters, so memory use does not grow with the number of games.
+
+Example:
+
+    python scheduler.py results.jsonl --games 10000 --workers 8
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import sys
+
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from isolation import Board
+from tournament import (TIME_LIMIT, make_cpu_agents, make_executor,
+                        make_test_agents)
+
+# Columns of the output file, in order
+FIELDS = ["id", "cpu", "test", "game", "test_seat", "opening", "winner",
+          "termination", "plies", "cpu_move_ms", "test_move_ms"]
+
+# z-score of the two-sided 95% confidence interval
+Z_95 = 1.96
+
+
+def wilson_interval(wins, games, z=Z_95):
+    """Return the (low, high) Wilson score confidence interval of a win
+    rate, which stays well-behaved for small samples and extreme rates.
+    """
+    if not games:
+        return 0., 1.
+    rate = wins / games
+    denom = 1 + z * z / games
+    center = (rate + z * z / (2 * games)) / denom
+    margin = z * math.sqrt(rate * (1 - rate) / games +
+                           z * z / (4 * games * games)) / denom
+    return max(0., center - margin), min(1., center + margin)
+
+
+def game_opening(seed, match):
+    """Return the random move and response that open every game of the given
+    match number.
+    """
+    rng = random.Random("{}-{}".format(seed, match))
+    game = Board("Player1", "Player2")
+    opening = []
+    for _ in range(2):
+        move = rng.choice(sorted(game.get_legal_moves()))
+        game.apply_move(move)
+        opening.append(move)
+    return opening
+
+
+def play_scheduled_game(pairing, cpu_spec, test_spec, game_idx, opening,
+                        time_limit):
+    """Play one scheduled game and return its result record. This is the
+    unit of work run by worker processes.
+    """
+    cpu_player = cpu_spec.build()
+    test_player = test_spec.build()
+    test_first = game_idx % 2 == 1
+    if test_first:
+        game = Board(test_player, cpu_player)
+    else:
+        game = Board(cpu_player, test_player)
+    for move in opening:
+        game.apply_move(move)
+
+    move_times = []
+    winner, history, termination = game.play(time_limit=time_limit,
+                                             move_times=move_times)
+    # move_times alternates starting with the player to move after the opening
+    # (player 1, since the opening has an even number of moves)
+    first_times = [round(t, 3) for t in move_times[0::2]]
+    second_times = [round(t, 3) for t in move_times[1::2]]
+    cpu_name, test_name = pairing
+    return {
+        "id": "{}|{}|{}".format(cpu_name, test_name, game_idx),
+        "cpu": cpu_name,
+        "test": test_name,
+        "game": game_idx,
+        "test_seat": "first" if test_first else "second",
+        "opening": [list(move) for move in opening],
+        "winner": "test" if winner is test_player else "cpu",
+        "termination": termination,
+        "plies": len(opening) + len(history),
+        "cpu_move_ms": second_times if test_first else first_times,
+        "test_move_ms": first_times if test_first else second_times,
+    }
+
+
+class ResultWriter:
+    """Append-only writer of game records in JSONL or CSV format. Every
+    record is flushed as soon as it is written, so an interrupted run loses
+    at most the games in progress.
+    """
+
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="")
+        if fmt == "csv":
+            self._writer = csv.DictWriter(self._file, fieldnames=FIELDS)
+            if is_new:
+                self._writer.writeheader()
+
+    def write(self, record):
+        if self.fmt == "csv":
+            row = dict(record)
+            for field in ("opening", "cpu_move_ms", "test_move_ms"):
+                row[field] = json.dumps(row[field])
+            self._writer.writerow(row)
+        else:
+            self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def trim_partial_record(path):
+    """Truncate an output file after its last complete line, dropping the
+    record that was being written if the previous run was interrupted, so
+    that it can be read and appended to. Return the number of bytes removed.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r+b") as f:
+        size = end = f.seek(0, os.SEEK_END)
+        # Scan backwards for the last newline
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+    return size - end
+
+
+def read_results(path, fmt):
+    """Yield the (pairing, game number, test won) summary of every record in
+    an existing output file, one at a time.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            yield ((row["cpu"], row["test"]), int(row["game"]),
+                   row["winner"] == "test")
+
+
+class Scoreboard:
+    """Running win counts of every pairing, and a bitmap of the games each
+    pairing has completed so that a resumed run can skip them.
+    """
+
+    def __init__(self, pairings, num_games):
+        self.num_games = num_games
+        self.wins = {pairing: 0 for pairing in pairings}
+        self.games = {pairing: 0 for pairing in pairings}
+        self._done = {pairing: bytearray((num_games + 7) // 8)
+                      for pairing in pairings}
+
+    def is_done(self, pairing, game_idx):
+        return bool(self._done[pairing][game_idx >> 3] & (1 << (game_idx & 7)))
+
+    def record(self, pairing, game_idx, test_won):
+        if pairing not in self.wins or game_idx >= self.num_games:
+            return
+        if self.is_done(pairing, game_idx):
+            return
+        self._done[pairing][game_idx >> 3] |= 1 << (game_idx & 7)
+        self.games[pairing] += 1
+        self.wins[pairing] += test_won
+
+    def completed(self):
+        return sum(self.games.values())
+
+    def print_table(self, out=sys.stdout):
+        """Print the win rate and 95% confidence interval of every pairing, and
+        of every test agent over all its pairings.
+        """
+        print("\n{:^13}{:^13}{:>8}{:>9}{:>17}".format(
+            "Test", "Opponent", "Games", "Win Rate", "95% CI"), file=out)
+        totals = {}
+        for (cpu, test), games in self.games.items():
+            wins = self.wins[(cpu, test)]
+            total = totals.setdefault(test, [0, 0])
+            total[0] += wins
+            total[1] += games
+            self._print_row(test, cpu, wins, games, out)
+        print("-" * 60, file=out)
+        for test, (wins, games) in totals.items():
+            self._print_row(test, "(all)", wins, games, out)
+
+    @staticmethod
+    def _print_row(test, cpu, wins, games, out):
+        low, high = wilson_interval(wins, games)
+        rate = 100 * wins / games if games else 0.
+        print("{:^13}{:^13}{:>8}{:>8.1f}%   [{:5.1f}%, {:5.1f}%]".format(
+            test, cpu, games, rate, 100 * low, 100 * high), file=out)
+
+
+def schedule(cpu_agents, test_agents, num_games, seed):
+    """Lazily yield (pairing, cpu spec, test spec, game number, opening) for
+    every scheduled game, match by match so that all pairings progress
+    together.
+    """
+    for game_idx in range(num_games):
+        opening = game_opening(seed, game_idx // 2)
+        for cpu in cpu_agents:
+            for test in test_agents:
+                yield ((cpu.name, test.name), cpu.player, test.player,
+                       game_idx, opening)
+
+
+def run(path, num_games, fmt="jsonl", workers=1, seed=0,
+        time_limit=TIME_LIMIT, report_every=100, cpu_agents=None,
+        test_agents=None):
+    """Play every scheduled game that is not already recorded in the output
+    file, appending each result as it completes, and return the scoreboard.
+    """
+    cpu_agents = cpu_agents if cpu_agents is not None else make_cpu_agents()
+    test_agents = test_agents if test_agents is not None else make_test_agents()
+    pairings = [(cpu.name, test.name) for cpu in cpu_agents
+                for test in test_agents]
+    if len(set(pairings)) != len(pairings):
+        raise ValueError("Agent names must be unique within each agent list.")
+
+    scoreboard = Scoreboard(pairings, num_games)
+    if trim_partial_record(path):
+        print("Dropped a partially written record from {}.".format(path))
+    for pairing, game_idx, test_won in read_results(path, fmt):
+        scoreboard.record(pairing, game_idx, test_won)
+    if scoreboard.completed():
+        print("Resuming with {} games already recorded.".format(
+            scoreboard.completed()))
+
+    pending = ((pairing, cpu, test, game_idx, opening)
+               for pairing, cpu, test, game_idx, opening
+               in schedule(cpu_agents, test_agents, num_games, seed)
+               if not scoreboard.is_done(pairing, game_idx))
+
+    writer = ResultWriter(path, fmt)
+    played = 0
+
+    def finish(record):
+        nonlocal played
+        writer.write(record)
+        scoreboard.record((record["cpu"], record["test"]), record["game"],
+                          record["winner"] == "test")
+        played += 1
+        if report_every and played % report_every == 0:
+            print("{} games played ({} recorded)".format(
+                played, scoreboard.completed()), flush=True)
+
+    try:
+        if workers > 1:
+            with make_executor(workers) as executor:
+                # Keep a bounded number of games in flight so that memory
+                # stays flat however many games are scheduled
+                max_in_flight = 4 * workers
+                in_flight = set()
+                for task in pending:
+                    in_flight.add(executor.submit(play_scheduled_game, *task,
+                                                  time_limit))
+                    if len(in_flight) >= max_in_flight:
+                        done, in_flight = wait(in_flight,
+                                               return_when=FIRST_COMPLETED)
+                        for future in done:
+                            finish(future.result())
+                for future in wait(in_flight).done:
+                    finish(future.result())
+        else:
+            for task in pending:
+                finish(play_scheduled_game(*task, time_limit))
+    finally:
+        writer.close()
+
+    return scoreboard
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stream the results of many tournament games to a file.")
+    parser.add_argument("output", help="results file (appended to; existing "
+                                       "games are skipped on resume)")
+    parser.add_argument("--games", type=int, default=1000,
+                        help="number of games per pairing (default: 1000)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                        help="output format (default: from file extension)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (at most one per core)")
+    parser.add_argument("--seed", default=0,
+                        help="seed of the opening schedule (default: 0)")
+    parser.add_argument("--time-limit", type=int, default=TIME_LIMIT,
+                        help="milliseconds per move (default: {})".format(
+                            TIME_LIMIT))
+    parser.add_argument("--report-every", type=int, default=100,
+                        help="print progress every N games (0 disables)")
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "csv" if args.output.endswith(".csv") else "jsonl"
+
+    scoreboard = run(args.output, args.games, fmt=fmt, workers=args.workers,
+                     seed=args.seed, time_limit=args.time_limit,
+                     report_every=args.report_every)
+    scoreboard.print_table()
+
+
+if __name__ == "__main__":
+    main()
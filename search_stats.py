@@ -0,0 +1,88 @@
+"""This file contains the `SearchStats` counters collected by instrumented
+search agents (see the `instrument` option of the players in `game_agent`).
+
+Each get_move() call of an instrumented agent fills a fresh `SearchStats`,
+and the agent merges it into a running total so that a whole tournament can
+be summarized per agent.
+"""
+import timeit
+
+timer = timeit.default_timer
+
+
+class SearchStats:
+    """Counters describing the work done by one or more searches.
+
+    Attributes
+    ----------
+    moves : int
+        Number of get_move() calls included in the counters.
+
+    nodes : int
+        Number of positions visited by the search (interior and leaf).
+
+    leaf_evals : int
+        Number of calls to the score function.
+
+    cutoffs : int
+        Number of alpha-beta cutoffs.
+
+    rollouts : int
+        Number of Monte Carlo playouts (see `competition_agent.CustomPlayer`).
+
+    researches : int
+        Number of subtrees searched again with a wider window because a
+        null-window scout search or an aspiration window failed (see the
+        `pvs` and `aspiration_window` options of `game_agent.AlphaBetaPlayer`).
+
+    max_depth : int
+        Deepest completed search depth (summed over merged searches; see
+        `avg_depth`).
+
+    eval_time, movegen_time, search_time : float
+        Seconds spent in the score function, in legal move generation and
+        terminal tests, and in get_move() overall.
+    """
+
+    FIELDS = ("moves", "nodes", "leaf_evals", "cutoffs", "rollouts",
+              "researches", "max_depth", "eval_time", "movegen_time",
+              "search_time")
+
+    def __init__(self, **counters):
+        for field in self.FIELDS:
+            setattr(self, field, counters.get(field, 0))
+
+    def merge(self, other):
+        """Add the counters of another `SearchStats` to this one. """
+        for field in self.FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        return self
+
+    def as_dict(self):
+        """Return the counters as a (picklable, JSON-friendly) dict. """
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.search_time if self.search_time else 0.
+
+    @property
+    def rollouts_per_second(self):
+        return self.rollouts / self.search_time if self.search_time else 0.
+
+    @property
+    def avg_depth(self):
+        return self.max_depth / self.moves if self.moves else 0.
+
+    @property
+    def eval_fraction(self):
+        return self.eval_time / self.search_time if self.search_time else 0.
+
+    @property
+    def movegen_fraction(self):
+        return self.movegen_time / self.search_time if self.search_time else 0.
+
+    def __repr__(self):
+        return "SearchStats({})".format(", ".join(
+            "{}={!r}".format(field, getattr(self, field))
+            for field in self.FIELDS))
@@ -0,0 +1,150 @@
+"""This file contains the `TimeManager` used by `game_agent.AlphaBetaPlayer`
+(see its `time_manager` option) to decide between two iterative deepening
+iterations whether the next one is worth starting.
+
+Without a time manager, iterative deepening starts iterations until the
+timer expires in the middle of one, and the work of that last, partial
+iteration is thrown away. The manager predicts the cost of the next
+iteration from the effective branching factor of the previous ones (the
+ratio of the number of nodes of consecutive iterations) and stops the
+search early when the prediction does not fit in the time left, or once
+the iterations are deeper than any line of play left. In critical
+positions, where the extra depth is most likely to change the move (the
+best move changed at the last iteration, or the player has few legal
+moves), it still starts iterations predicted to take up to
+(1 + extension) times the time left, betting that the prediction is
+pessimistic.
+"""
+
+
+class TimeManager:
+    """Stop rule for iterative deepening based on the predicted cost of the
+    next iteration.
+
+    Parameters
+    ----------
+    extension : float (optional)
+        In critical positions, iterations predicted to take up to
+        (1 + extension) times the time left are still started.
+
+    few_moves : int (optional)
+        Positions where the player has at most this many legal moves are
+        critical.
+
+    min_branching : float (optional)
+        Lower bound of the effective branching factor used in predictions,
+        so that an iteration made cheap by transposition table hits does
+        not make the next one look free.
+
+    Attributes
+    ----------
+    early_stops : int
+        Number of searches stopped before the timer expired.
+    """
+
+    def __init__(self, extension=1., few_moves=2, min_branching=1.5):
+        self.extension = extension
+        self.few_moves = few_moves
+        self.min_branching = min_branching
+        self.early_stops = 0
+        # (depth, total nodes, nodes, milliseconds, best move) of every
+        # completed iteration of the current search
+        self._iterations = []
+        self._critical_moves = False
+        self._horizon = None
+        self._last_time_left = None
+
+    def start(self, time_left, num_moves, horizon):
+        """Start managing the search of a new position.
+
+        Parameters
+        ----------
+        time_left : float
+            Milliseconds left before the search must stop (time_left() of
+            the player minus its TIMER_THRESHOLD).
+
+        num_moves : int
+            The number of legal moves of the player.
+
+        horizon : int
+            The number of blank cells of the board: no line of play is
+            longer, so deeper iterations cannot change the result.
+        """
+        self._iterations = []
+        self._critical_moves = num_moves <= self.few_moves
+        self._horizon = horizon
+        self._last_time_left = time_left
+
+    def iteration_done(self, depth, nodes, time_left, best_move):
+        """Record a completed iteration.
+
+        Parameters
+        ----------
+        depth : int
+            The depth of the iteration.
+
+        nodes : int
+            The total number of nodes visited by the search so far.
+
+        time_left : float
+            Milliseconds left before the search must stop.
+
+        best_move : (int, int)
+            The best move found by the iteration.
+        """
+        elapsed = self._last_time_left - time_left
+        last_nodes = self._iterations[-1][1] if self._iterations else 0
+        self._iterations.append((depth, nodes, nodes - last_nodes, elapsed,
+                                 best_move))
+        self._last_time_left = time_left
+
+    def branching_factor(self):
+        """Return the effective branching factor measured over the last
+        iterations, or None before two iterations are completed.
+        """
+        sizes = [iteration[2] for iteration in self._iterations[-3:]]
+        if len(sizes) < 2 or not all(sizes):
+            return None
+        # The geometric mean over two ratios smooths out the odd-even effect
+        # of alpha-beta, where odd and even depths prune differently
+        ratio = sizes[-1] / sizes[0]
+        return max(self.min_branching, ratio ** (1. / (len(sizes) - 1)))
+
+    def predicted_time(self):
+        """Return the predicted duration in milliseconds of the next
+        iteration, or None if it cannot be predicted yet.
+        """
+        branching = self.branching_factor()
+        if branching is None:
+            return None
+        return self._iterations[-1][3] * branching
+
+    def is_critical(self):
+        """Return True if the position deserves extra time: the player has
+        few legal moves or the best move changed at the last iteration.
+        """
+        if self._critical_moves:
+            return True
+        return (len(self._iterations) >= 2 and
+                self._iterations[-1][4] != self._iterations[-2][4])
+
+    def should_stop(self, time_left):
+        """Return True if the next iteration should not be started, because
+        it cannot change the result or is not predicted to complete in the
+        time left (in milliseconds).
+        """
+        if not self._iterations:
+            return False
+        if self._iterations[-1][0] >= self._horizon:
+            self.early_stops += 1
+            return True
+        predicted = self.predicted_time()
+        if predicted is None:
+            return False
+        budget = time_left
+        if self.is_critical():
+            budget *= 1 + self.extension
+        if predicted > budget:
+            self.early_stops += 1
+            return True
+        return False
@@ -11,20 +11,29 @@ players, and the players play each match twice -- once as the first player and
 once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
 """
+import argparse
 import itertools
+import multiprocessing
+import os
 import random
 import warnings
 
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
-from isolation import Board
+from endgame import EndgameSolver
+from eval_cache import EvalCache
+from isolation import Board, BitBoard
+from search_stats import SearchStats
+from time_manager import TimeManager
 from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
-from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
-                        custom_score_2, custom_score_3)
+from game_agent import (MinimaxPlayer, AlphaBetaPlayer, SearchPlayer,
+                        custom_score, custom_score_2, custom_score_3)
 
 NUM_MATCHES = 5  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
+BOARD_CLASS = Board  # class of the game boards (see --bitboard)
 
 DESCRIPTION = """
 This script evaluates the performance of the custom_score evaluation
@@ -37,36 +46,198 @@ game_agent.py.
 Agent = namedtuple("Agent", ["player", "name"])
 
 
-def play_round(cpu_agent, test_agents, win_counts, num_matches):
+class AgentSpec:
+    """Picklable recipe for a player, used instead of a live player object
+    when games are played in worker processes. Every game gets a fresh
+    player built from the spec.
+
+    Parameters
+    ----------
+    cls : class
+        The player class, e.g., `AlphaBetaPlayer`.
+
+    **kwargs
+        Keyword arguments passed to the player constructor. Values must be
+        picklable (e.g., module-level score functions).
+    """
+
+    def __init__(self, cls, **kwargs):
+        self.cls = cls
+        self.kwargs = kwargs
+
+    def build(self):
+        """Return a new player object built from the spec. """
+        return self.cls(**self.kwargs)
+
+
+def game_seed(seed, *labels):
+    """Return the seed of one game (or opening) of a tournament seeded with
+    seed, identified by the labels, or None if the tournament is not seeded.
+    """
+    if seed is None:
+        return None
+    return "-".join(str(label) for label in (seed,) + labels)
+
+
+def random_opening(seed=None):
+    """Return a random move and response used to initialize a set of games,
+    drawn from a generator seeded with seed, or from the global `random`
+    module if seed is None.
+    """
+    rng = random if seed is None else random.Random(seed)
+    game = Board("Player1", "Player2")
+    opening = []
+    for _ in range(2):
+        move = rng.choice(sorted(game.get_legal_moves()))
+        game.apply_move(move)
+        opening.append(move)
+    return opening
+
+
+def new_game(player_1, player_2, opening, seed=None, board_cls=Board):
+    """Return a board of class board_cls between the players after the
+    opening moves. If seed is given, the board shuffles moves with its own
+    generator seeded with it and the global `random` module (used by
+    `RandomPlayer`) is seeded too, so that a game between agents that do
+    not read the clock is reproducible.
+    """
+    if seed is not None:
+        random.seed(seed)
+    game = board_cls(player_1, player_2, seed=seed)
+    for move in opening:
+        game.apply_move(move)
+    return game
+
+
+def play_game(cpu_spec, test_spec, cpu_first, opening, time_limit, seed=None,
+              board_cls=Board):
+    """Play one game between players built from the agent specs, starting
+    with the opening moves (see `new_game` for the seed and board class).
+    This is the unit of work run by worker processes.
+
+    Returns
+    -------
+    (bool, str, dict or None)
+        Whether the test agent won, the termination reason, and the search
+        counters of the test agent if it is instrumented.
+    """
+    cpu_player = cpu_spec.build()
+    test_player = test_spec.build()
+    if cpu_first:
+        game = new_game(cpu_player, test_player, opening, seed, board_cls)
+    else:
+        game = new_game(test_player, cpu_player, opening, seed, board_cls)
+    winner, _, termination = game.play(time_limit=time_limit)
+    stats = getattr(test_player, "total_stats", None)
+    return (winner is test_player, termination,
+            stats.as_dict() if stats is not None else None)
+
+
+def _pin_worker(counter, lock):
+    """Process pool initializer that pins each worker to its own core, so
+    workers never compete for a core and every game is timed fairly.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    with lock:
+        worker_idx = counter.value
+        counter.value += 1
+    cores = sorted(os.sched_getaffinity(0))
+    os.sched_setaffinity(0, {cores[worker_idx % len(cores)]})
+
+
+def available_cores():
+    """Return the number of cores this process is allowed to run on. """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def make_executor(workers):
+    """Return a process pool of at most one worker per available core. """
+    cores = available_cores()
+    if workers > cores:
+        warnings.warn(("Requested {} workers but only {} cores are available; "
+                       "using {} workers to keep game timing fair.").format(
+                           workers, cores, cores))
+        workers = cores
+    counter = multiprocessing.Value("i", 0)
+    lock = multiprocessing.Lock()
+    return ProcessPoolExecutor(max_workers=workers, initializer=_pin_worker,
+                               initargs=(counter, lock))
+
+
+def play_round_parallel(cpu_agent, test_agents, win_counts, num_matches,
+                        executor, search_stats=None, seed=None):
+    """Same as `play_round`, but the agents hold `AgentSpec` objects and the
+    games are played by the worker processes of the executor. The search
+    counters of instrumented test agents are merged into search_stats.
+    """
+    timeout_count = 0
+    forfeit_count = 0
+    futures = []
+    for match in range(num_matches):
+        opening = random_opening(game_seed(seed, cpu_agent.name, match))
+        for idx, agent in enumerate(test_agents):
+            for cpu_first in (True, False):
+                future = executor.submit(
+                    play_game, cpu_agent.player, agent.player, cpu_first,
+                    opening, TIME_LIMIT,
+                    game_seed(seed, cpu_agent.name, match, idx, cpu_first),
+                    BOARD_CLASS)
+                futures.append((agent, future))
+
+    # tally the results
+    for agent, future in futures:
+        test_won, termination, stats = future.result()
+        if stats is not None and search_stats is not None:
+            search_stats[agent.player].merge(SearchStats(**stats))
+        if test_won:
+            win_counts[agent.player] += 1
+        else:
+            win_counts[cpu_agent.player] += 1
+
+        if termination == "timeout":
+            timeout_count += 1
+        elif termination == "forfeit":
+            forfeit_count += 1
+
+    return timeout_count, forfeit_count
+
+
+def play_round(cpu_agent, test_agents, win_counts, num_matches, seed=None):
     """Compare the test agents to the cpu agent in "fair" matches.
 
     "Fair" matches use random starting locations and force the agents to
     play as both first and second player to control for advantages resulting
     from choosing better opening moves or having first initiative to move.
+
+    If seed is given, the openings and the games are seeded from it (see
+    `new_game`), the same way as in `play_round_parallel`.
     """
     timeout_count = 0
     forfeit_count = 0
-    for _ in range(num_matches):
-
-        games = sum([[Board(cpu_agent.player, agent.player),
-                      Board(agent.player, cpu_agent.player)]
-                    for agent in test_agents], [])
+    for match in range(num_matches):
 
         # initialize all games with a random move and response
-        for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
-            for game in games:
-                game.apply_move(move)
+        opening = random_opening(game_seed(seed, cpu_agent.name, match))
 
         # play all games and tally the results
-        for game in games:
-            winner, _, termination = game.play(time_limit=TIME_LIMIT)
-            win_counts[winner] += 1
-
-            if termination == "timeout":
-                timeout_count += 1
-            elif termination == "forfeit":
-                forfeit_count += 1
+        for idx, agent in enumerate(test_agents):
+            for cpu_first in (True, False):
+                if cpu_first:
+                    players = (cpu_agent.player, agent.player)
+                else:
+                    players = (agent.player, cpu_agent.player)
+                game = new_game(*players, opening, game_seed(
+                    seed, cpu_agent.name, match, idx, cpu_first), BOARD_CLASS)
+                winner, _, termination = game.play(time_limit=TIME_LIMIT)
+                win_counts[winner] += 1
+
+                if termination == "timeout":
+                    timeout_count += 1
+                elif termination == "forfeit":
+                    forfeit_count += 1
 
     return timeout_count, forfeit_count
 
@@ -77,12 +248,19 @@ def update(total_wins, wins):
     return total_wins
 
 
-def play_matches(cpu_agents, test_agents, num_matches):
-    """Play matches between the test agent and each cpu_agent individually. """
+def play_matches(cpu_agents, test_agents, num_matches, executor=None,
+                 seed=None):
+    """Play matches between the test agent and each cpu_agent individually.
+
+    If an executor is given, the agents must hold `AgentSpec` objects and
+    the games are played in its worker processes. If seed is given, the
+    openings and games are seeded from it (see `new_game`).
+    """
     total_wins = {agent.player: 0 for agent in test_agents}
     total_timeouts = 0.
     total_forfeits = 0.
     total_matches = 2 * num_matches * len(cpu_agents)
+    search_stats = {agent.player: SearchStats() for agent in test_agents}
 
     print("\n{:^9}{:^13}".format("Match #", "Opponent") + ''.join(['{:^13}'.format(x[1].name) for x in enumerate(test_agents)]))
     print("{:^9}{:^13} ".format("", "") +  ' '.join(['{:^5}| {:^5}'.format("Won", "Lost") for x in enumerate(test_agents)]))
@@ -93,7 +271,12 @@ def play_matches(cpu_agents, test_agents, num_matches):
 
         print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
 
-        counts = play_round(agent, test_agents, wins, num_matches)
+        if executor is None:
+            counts = play_round(agent, test_agents, wins, num_matches, seed)
+        else:
+            counts = play_round_parallel(agent, test_agents, wins,
+                                         num_matches, executor, search_stats,
+                                         seed)
         total_timeouts += counts[0]
         total_forfeits += counts[1]
         total_wins = update(total_wins, wins)
@@ -114,6 +297,13 @@ def play_matches(cpu_agents, test_agents, num_matches):
             ) for x in enumerate(test_agents)
     ]))
 
+    if executor is None:
+        for agent in test_agents:
+            if getattr(agent.player, "total_stats", None) is not None:
+                search_stats[agent.player] = agent.player.total_stats
+    if any(stats.moves for stats in search_stats.values()):
+        print_search_stats(test_agents, search_stats)
+
     if total_timeouts:
         print(("\nThere were {} timeouts during the tournament -- make sure " +
                "your agent handles search timeout correctly, and consider " +
@@ -124,33 +314,146 @@ def play_matches(cpu_agents, test_agents, num_matches):
                "legal moves available to play.\n").format(total_forfeits))
 
 
-def main():
-
-    # Define two agents to compare -- these agents will play from the same
-    # starting position against the same adversaries in the tournament
-    test_agents = [
-        Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score), "AB_Custom"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score_2), "AB_Custom_2"),
-        Agent(AlphaBetaPlayer(score_fn=custom_score_3), "AB_Custom_3")
+def print_search_stats(test_agents, search_stats):
+    """Print the search counters collected by instrumented test agents. """
+    print("\n{:^13}{:>11}{:>11}{:>10}{:>11}{:>12}{:>8}{:>9}{:>11}".format(
+        "Agent", "Nodes", "Nodes/s", "Cutoffs", "Re-search", "Rollouts/s",
+        "Depth", "Eval %", "Movegen %"))
+    for agent in test_agents:
+        stats = search_stats[agent.player]
+        if not stats.moves:
+            continue
+        print(("{:^13}{:>11}{:>11.0f}{:>10}{:>11}{:>12.0f}{:>8.1f}{:>8.1f}%"
+               "{:>10.1f}%").format(
+            agent.name, stats.nodes, stats.nodes_per_second, stats.cutoffs,
+            stats.researches, stats.rollouts_per_second, stats.avg_depth,
+            100 * stats.eval_fraction, 100 * stats.movegen_fraction))
+
+
+def make_test_agents():
+    """Return the agents evaluated by the tournament, as `AgentSpec`s. These
+    agents play from the same starting positions against the same
+    adversaries.
+    """
+    return [
+        Agent(AgentSpec(AlphaBetaPlayer, score_fn=improved_score), "AB_Improved"),
+        Agent(AgentSpec(AlphaBetaPlayer, score_fn=custom_score), "AB_Custom"),
+        Agent(AgentSpec(AlphaBetaPlayer, score_fn=custom_score_2), "AB_Custom_2"),
+        Agent(AgentSpec(AlphaBetaPlayer, score_fn=custom_score_3), "AB_Custom_3")
     ]
 
-    # Define a collection of agents to compete against the test agents
-    cpu_agents = [
-        Agent(RandomPlayer(), "Random"),
-        Agent(MinimaxPlayer(score_fn=open_move_score), "MM_Open"),
-        Agent(MinimaxPlayer(score_fn=center_score), "MM_Center"),
-        Agent(MinimaxPlayer(score_fn=improved_score), "MM_Improved"),
-        Agent(AlphaBetaPlayer(score_fn=open_move_score), "AB_Open"),
-        Agent(AlphaBetaPlayer(score_fn=center_score), "AB_Center"),
-        Agent(AlphaBetaPlayer(score_fn=improved_score), "AB_Improved")
+
+def make_cpu_agents():
+    """Return the collection of agents that compete against the test agents,
+    as `AgentSpec`s.
+    """
+    return [
+        Agent(AgentSpec(RandomPlayer), "Random"),
+        Agent(AgentSpec(MinimaxPlayer, score_fn=open_move_score), "MM_Open"),
+        Agent(AgentSpec(MinimaxPlayer, score_fn=center_score), "MM_Center"),
+        Agent(AgentSpec(MinimaxPlayer, score_fn=improved_score), "MM_Improved"),
+        Agent(AgentSpec(AlphaBetaPlayer, score_fn=open_move_score), "AB_Open"),
+        Agent(AgentSpec(AlphaBetaPlayer, score_fn=center_score), "AB_Center"),
+        Agent(AgentSpec(AlphaBetaPlayer, score_fn=improved_score), "AB_Improved")
     ]
 
+
+def main():
+    global TIME_LIMIT, BOARD_CLASS
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes playing games in "
+                             "parallel (at most one per core)")
+    parser.add_argument("--instrument", action="store_true",
+                        help="collect and report search statistics (nodes, "
+                             "depth, evaluation time) of the test agents")
+    parser.add_argument("--node-limit", type=int, default=None,
+                        help="bound every search agent by this many nodes per "
+                             "move instead of by the clock")
+    parser.add_argument("--depth", type=int, default=None,
+                        help="bound every search agent by this search depth "
+                             "(fixed or last iterative deepening iteration) "
+                             "instead of by the clock")
+    parser.add_argument("--endgame", action="store_true",
+                        help="let the alpha-beta test agents solve endgames "
+                             "exactly once the players are separated")
+    parser.add_argument("--pvs", action="store_true",
+                        help="use principal variation search in the "
+                             "alpha-beta test agents")
+    parser.add_argument("--aspiration", type=float, default=None,
+                        metavar="WIDTH",
+                        help="start every iterative deepening iteration of "
+                             "the alpha-beta test agents with a window of "
+                             "this half-width around the previous value")
+    parser.add_argument("--eval-cache", action="store_true",
+                        help="cache the score function values of the test "
+                             "agents")
+    parser.add_argument("--time-manager", action="store_true",
+                        help="let the alpha-beta test agents stop iterative "
+                             "deepening when the next iteration is not "
+                             "predicted to complete")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="milliseconds per move (default: {}, or no limit "
+                             "with --node-limit or --depth)".format(TIME_LIMIT))
+    parser.add_argument("--bitboard", action="store_true",
+                        help="play the games on `isolation.BitBoard` boards "
+                             "instead of `isolation.Board`")
+    parser.add_argument("--seed", default=None,
+                        help="seed the openings and the move order of every "
+                             "game, so that games between agents bounded by "
+                             "--node-limit or --depth are reproducible")
+    args = parser.parse_args()
+
+    test_agents = make_test_agents()
+    cpu_agents = make_cpu_agents()
+    if args.instrument:
+        for agent in test_agents:
+            agent.player.kwargs["instrument"] = True
+    if args.endgame:
+        for agent in test_agents:
+            if issubclass(agent.player.cls, AlphaBetaPlayer):
+                agent.player.kwargs["endgame_solver"] = EndgameSolver()
+    for agent in test_agents:
+        if issubclass(agent.player.cls, AlphaBetaPlayer):
+            agent.player.kwargs.update(pvs=args.pvs,
+                                       aspiration_window=args.aspiration)
+    if args.time_manager:
+        for agent in test_agents:
+            if issubclass(agent.player.cls, AlphaBetaPlayer):
+                agent.player.kwargs["time_manager"] = TimeManager()
+    if args.eval_cache:
+        for agent in test_agents:
+            score_fn = agent.player.kwargs.get("score_fn")
+            if score_fn is not None:
+                agent.player.kwargs["score_fn"] = EvalCache(score_fn)
+
+    # Searches bounded by nodes or depth ignore the clock, so their moves do
+    # not depend on machine load (and with --seed, their games are
+    # reproducible)
+    if args.node_limit is not None or args.depth is not None:
+        for agent in test_agents + cpu_agents:
+            if issubclass(agent.player.cls, SearchPlayer):
+                agent.player.kwargs.update(node_limit=args.node_limit,
+                                           depth_limit=args.depth,
+                                           use_clock=False)
+        TIME_LIMIT = float("inf")
+    if args.time_limit is not None:
+        TIME_LIMIT = args.time_limit
+    if args.bitboard:
+        BOARD_CLASS = BitBoard
+
     print(DESCRIPTION)
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
-    play_matches(cpu_agents, test_agents, NUM_MATCHES)
+    if args.workers > 1:
+        with make_executor(args.workers) as executor:
+            play_matches(cpu_agents, test_agents, NUM_MATCHES, executor,
+                         args.seed)
+    else:
+        test_agents = [Agent(a.player.build(), a.name) for a in test_agents]
+        cpu_agents = [Agent(a.player.build(), a.name) for a in cpu_agents]
+        play_matches(cpu_agents, test_agents, NUM_MATCHES, seed=args.seed)
 
 
 if __name__ == "__main__":
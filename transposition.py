@@ -0,0 +1,109 @@
+"""This file contains a fixed-capacity transposition table for caching the
+results of alpha-beta searches, keyed by the Zobrist hash of a position
+(`isolation.Board.zobrist_key`).
+
+The table is organized in two-slot buckets: the first slot of each bucket is
+depth-preferred (it keeps the entry searched to the greatest depth, unless
+that entry is left over from an earlier search) and the second slot is
+always-replace (it keeps the most recent entry that lost the depth contest).
+"""
+
+# Entry flags indicating how the stored value bounds the true minimax value
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Rough memory cost of one stored entry (a 6-tuple plus its int and float
+# members) used to convert the requested table size into a bucket count
+ENTRY_BYTES = 160
+
+
+class TranspositionTable:
+    """Fixed-capacity table of search results.
+
+    Entries are stored as tuples (key, depth, value, flag, move, age), where
+    `depth` is the remaining search depth below the position, `flag` is one
+    of EXACT, LOWER or UPPER, `move` is the best move found (or None), and
+    `age` is the search generation in which the entry was stored.
+
+    Parameters
+    ----------
+    size_mb : float (optional)
+        Approximate memory budget of the table in megabytes.
+    """
+
+    def __init__(self, size_mb=16):
+        self.num_buckets = max(1, int(size_mb * 2**20) // (2 * ENTRY_BYTES))
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self._depth_slots = [None] * self.num_buckets
+        self._recent_slots = [None] * self.num_buckets
+
+    def __len__(self):
+        return (sum(e is not None for e in self._depth_slots) +
+                sum(e is not None for e in self._recent_slots))
+
+    def clear(self):
+        """Remove every entry from the table. """
+        self._depth_slots = [None] * self.num_buckets
+        self._recent_slots = [None] * self.num_buckets
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        """Start a new search generation. Entries from earlier generations are
+        kept, but they no longer protect their depth-preferred slot.
+        """
+        self.age += 1
+
+    def probe(self, key):
+        """Return the stored entry for the position key, or None if the
+        position is not in the table.
+        """
+        self.probes += 1
+        idx = key % self.num_buckets
+        entry = self._depth_slots[idx]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = self._recent_slots[idx]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, value, flag, move=None):
+        """Store a search result for the position key.
+
+        Parameters
+        ----------
+        key : int
+            The Zobrist key of the searched position.
+
+        depth : int
+            The remaining search depth below the position.
+
+        value : float
+            The value returned by the search.
+
+        flag : int
+            EXACT if value is the minimax value of the position, LOWER if it
+            is a lower bound (fail high) or UPPER if it is an upper bound
+            (fail low).
+
+        move : (int, int) (optional)
+            The best move found in the position.
+        """
+        idx = key % self.num_buckets
+        entry = (key, depth, value, flag, move, self.age)
+        current = self._depth_slots[idx]
+        if (current is None or current[0] == key or depth >= current[1] or
+                current[5] != self.age):
+            # Demote the displaced entry rather than dropping it
+            if current is not None and current[0] != key:
+                self._recent_slots[idx] = current
+            self._depth_slots[idx] = entry
+        else:
+            self._recent_slots[idx] = entry